@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+from sqlalchemy.ext.asyncio import AsyncSession
+import config
+import crud
+import models
+
+Stage = Callable[..., Awaitable[Any]]
+
+
+class Metrics:
+    def __init__(self):
+        self.batches = 0
+        self.writes = 0
+        self.failed_writes = 0
+        self.failed_invalidations = 0
+        self.max_batch_size = 0
+        self.commit_seconds = 0.0
+        self.max_commit_seconds = 0.0
+        self.last_commit_seconds = 0.0
+
+    def record(self, size: int, failed: int, commit_seconds: float):
+        self.batches += 1
+        self.writes += size
+        self.failed_writes += failed
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.commit_seconds += commit_seconds
+        self.max_commit_seconds = max(self.max_commit_seconds, commit_seconds)
+        self.last_commit_seconds = commit_seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "writes": self.writes,
+            "failed_writes": self.failed_writes,
+            "failed_invalidations": self.failed_invalidations,
+            "mean_batch_size": self.writes / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "mean_commit_ms": 1000 * self.commit_seconds / self.batches if self.batches else 0.0,
+            "max_commit_ms": 1000 * self.max_commit_seconds,
+            "last_commit_ms": 1000 * self.last_commit_seconds,
+        }
+
+
+class WriteBatcher:
+    """group commit: writes submitted within window seconds of each other are staged in one transaction
+
+    Every write runs in its own savepoint, so a failing one is rolled back and reported to its caller
+    alone. Callers are resumed once the shared commit has finished."""
+
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = max_size
+        self.metrics = Metrics()
+        self.queue: asyncio.Queue[tuple[Stage, tuple, asyncio.Future]] | None = None
+        self.task: asyncio.Task | None = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self.__work())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def submit(self, stage: Stage, *args):
+        """runs stage(session, *args) in the next batch and returns its result once it is committed"""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((stage, args, future))
+        return await future
+
+    async def __work(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.window > 0:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.max_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self.__run(batch)
+
+    async def __run(self, batch: list[tuple[Stage, tuple, asyncio.Future]]):
+        results = []
+        try:
+            async with models.async_session() as session:
+                for stage, args, future in batch:
+                    results.append(await self.__stage(session, stage, args))
+                started = time.perf_counter()
+                await session.commit()
+                commit_seconds = time.perf_counter() - started
+                # the writes are committed, a cache that failed to drop their keys just serves them stale
+                try:
+                    await crud.invalidate_stale(session)
+                except Exception:
+                    self.metrics.failed_invalidations += 1
+        except Exception as e:
+            self.metrics.record(len(batch), len(batch), 0.0)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        failed = 0
+        for (_, _, future), (result, error) in zip(batch, results):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                failed += 1
+                future.set_exception(error)
+        self.metrics.record(len(batch), failed, commit_seconds)
+
+    @staticmethod
+    async def __stage(session: AsyncSession, stage: Stage, args: tuple) -> tuple[Any, Exception | None]:
+        try:
+            async with session.begin_nested():
+                return await stage(session, *args), None
+        except Exception as e:
+            return None, e
+
+
+writes = WriteBatcher(config.WRITE_BATCH_WINDOW_MS / 1000, config.WRITE_BATCH_MAX_SIZE)
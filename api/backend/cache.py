@@ -0,0 +1,141 @@
+import gzip
+import json
+import time
+import uuid
+from collections import OrderedDict
+import orjson
+from fastapi.encoders import jsonable_encoder
+import config
+
+FIELDS = "fields"
+# revoked tokens and users, see security
+AUTH = "auth"
+
+
+def event_key(event_id: int) -> str:
+    return f"event:{event_id}"
+
+
+def dots_key(event_id: int) -> str:
+    return f"dots:{event_id}"
+
+
+class LRUCache:
+    """in-process fallback, used when REDIS_URL is not set"""
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.entries.pop(key, None)
+
+
+class RedisCache:
+    """eviction is left to the server's maxmemory-policy, entries expire after ttl"""
+
+    def __init__(self, url: str, ttl: int):
+        from redis import asyncio as aioredis
+        self.redis = aioredis.from_url(url)
+        self.ttl = ttl
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.redis.get(config.CACHE_PREFIX + key)
+
+    async def set(self, key: str, value: bytes):
+        await self.redis.set(config.CACHE_PREFIX + key, value, ex=self.ttl)
+
+    async def delete(self, *keys: str):
+        # a bare DEL is an error
+        if keys:
+            await self.redis.delete(*(config.CACHE_PREFIX + key for key in keys))
+
+
+if config.REDIS_URL is None:
+    backend = LRUCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS)
+else:
+    backend = RedisCache(config.REDIS_URL, config.CACHE_TTL_SECONDS)
+
+
+# The bodies below are cached per version of what they were built from, gzipped. A version is an opaque
+# token replaced on every invalidation, so a stale body can never be served under a current version and
+# it doubles as a strong ETag. Tokens are random rather than counters, so a version lost to eviction or
+# another worker's cache is simply made up again instead of repeating an old one.
+
+def version_key(key: str) -> str:
+    return f"version:{key}"
+
+
+def body_key(key: str, version: str) -> str:
+    return f"{key}@{version}"
+
+
+async def version(key: str) -> str:
+    token = await backend.get(version_key(key))
+    if token is None:
+        token = uuid.uuid4().hex.encode()
+        await backend.set(version_key(key), token)
+    return token.decode()
+
+
+async def get(key: str, version: str) -> bytes | None:
+    """the gzipped body cached for this version of key"""
+    return await backend.get(body_key(key, version))
+
+
+async def put(key: str, version: str, body: bytes) -> bytes:
+    """gzips the body, stores and returns it"""
+    body = gzip.compress(body, compresslevel=config.CACHE_GZIP_LEVEL, mtime=0)
+    await backend.set(body_key(key, version), body)
+    return body
+
+
+def encode(payload) -> bytes:
+    """serializes the payload the way FastAPI would"""
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False).encode()
+
+
+def encode_records(payload) -> bytes:
+    """encode for payloads that are plain dicts, lists and scalars already, by orjson without
+    jsonable_encoder walking them first"""
+    return orjson.dumps(payload)
+
+
+async def invalidate(*keys: str):
+    """replaces the versions of keys and drops the bodies cached for the old ones"""
+    if not keys:
+        return
+    stale = []
+    for key in keys:
+        token = await backend.get(version_key(key))
+        if token is not None:
+            stale.append(body_key(key, token.decode()))
+    await backend.delete(*(version_key(key) for key in keys), *stale)
+
+
+def event_keys(event_id: int) -> tuple[str, ...]:
+    """everything that goes stale when an event or its operations change"""
+    return FIELDS, event_key(event_id), dots_key(event_id)
+
+
+async def invalidate_event(event_id: int):
+    await invalidate(*event_keys(event_id))
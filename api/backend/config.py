@@ -10,3 +10,43 @@ SECRET_KEY_JWT = _get_env("SECRET_KEY_JWT")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(_get_env("ACCESS_TOKEN_EXPIRE_MINUTES"))
 DB_URL = _get_env('DB_URL')
+DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
+DB_WRITE_RETRIES = int(os.getenv('DB_WRITE_RETRIES', 5))
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 256 * 1024 * 1024))
+
+REDIS_URL = os.getenv('REDIS_URL')
+# uvicorn workers, as the image runs them; the cache and the revocations only reach the other workers through Redis
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', 1))
+if MAX_WORKERS > 1 and REDIS_URL is None:
+    raise RuntimeError("`MAX_WORKERS > 1 needs REDIS_URL`")
+CACHE_PREFIX = os.getenv('CACHE_PREFIX', 'api:')
+CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 300))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+CACHE_GZIP_LEVEL = int(os.getenv('CACHE_GZIP_LEVEL', 6))
+
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', 10000))
+USER_CACHE_TTL_SECONDS = int(os.getenv('USER_CACHE_TTL_SECONDS', 30))
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 4))
+
+EXPORT_PROCESSES = int(os.getenv('EXPORT_PROCESSES', os.cpu_count() or 1))
+
+EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', 2))
+EXPORT_JOB_RESULTS_MAX_BYTES = int(os.getenv('EXPORT_JOB_RESULTS_MAX_BYTES', 256 * 1024 * 1024))
+EXPORT_JOB_MAX_JOBS = int(os.getenv('EXPORT_JOB_MAX_JOBS', 1000))
+EXPORT_JOB_MAX_QUEUED = int(os.getenv('EXPORT_JOB_MAX_QUEUED', 100))
+# idle workers look for queued jobs this often, running jobs report progress this often
+EXPORT_JOB_POLL_SECONDS = float(os.getenv('EXPORT_JOB_POLL_SECONDS', 1))
+# a running job without a heartbeat for this long lost its worker and is queued again
+EXPORT_JOB_STALE_SECONDS = float(os.getenv('EXPORT_JOB_STALE_SECONDS', 30))
+
+# group commit of parameter updates, off unless WRITE_BATCHING is set
+WRITE_BATCHING = os.getenv('WRITE_BATCHING') is not None
+WRITE_BATCH_WINDOW_MS = float(os.getenv('WRITE_BATCH_WINDOW_MS', 5))
+WRITE_BATCH_MAX_SIZE = int(os.getenv('WRITE_BATCH_MAX_SIZE', 500))
+
+# build /get_fields and /get_event_by_id bodies from Core rows and encode them with orjson
+FAST_JSON = os.getenv('FAST_JSON') is not None
@@ -1,18 +1,130 @@
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+import json
+import operator
+import re
+from sqlalchemy import select, insert, update, func, cast, literal_column, REAL, table, column, text
+from sqlalchemy.orm import selectinload, raiseload, contains_eager
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncResult
+from sqlalchemy.sql.elements import ColumnElement
 from models import User, Field, Bush, Well, Event, Operation, ExampleOperation
 import schemas
-from security import get_hash_password
-from typing import Sequence
+import cache
+from security import get_hash_password, forget_user
+from typing import Sequence, AsyncIterator
+
+
+# Relationships are lazy by default, so every query states what its endpoint actually
+# needs. Anything not listed raises instead of silently emitting more SQL.
+FIELD_TREE = selectinload(Field.bushes).selectinload(Bush.wells).selectinload(Well.events).selectinload(Event.operations)
+HIERARCHY = (Field.bushes, Bush.wells, Well.events, Event.operations)
+
+
+def subtree(level: int, depth: int) -> tuple:
+    """loader options expanding `depth` levels of the hierarchy below its `level`-th entity"""
+    relationships = HIERARCHY[level:level + depth]
+    if not relationships:
+        return raiseload('*'),
+    loader = selectinload(relationships[0])
+    for relationship in relationships[1:]:
+        loader = loader.selectinload(relationship)
+    return loader, raiseload('*')
+
+
+def _number(parameters, key: str) -> ColumnElement:
+    """a numeric parameter, the path is a literal so that it matches the expression indexes"""
+    return cast(func.json_extract(parameters, literal_column(f"'$.{key}'")), REAL)
+
+
+# operation parameters that can be filtered on, every one of them has an expression index (migration 3)
+OPERATION_PARAMETERS = {
+    key: _number(Operation.parameters, key)
+    for key in ('plannedDepth', 'actualDepth', 'plannedTime', 'actualTime', 'plannedNpt')
+}
+OPERATION_PARAMETERS['behindTime'] = OPERATION_PARAMETERS['actualTime'] - OPERATION_PARAMETERS['plannedTime']
+
+
+def _condition(expression: ColumnElement, parameter_filter: schemas.ParameterFilter) -> ColumnElement:
+    if parameter_filter.op == 'exists':
+        return expression.is_not(None)
+    if parameter_filter.op == 'missing':
+        return expression.is_(None)
+    return getattr(operator, parameter_filter.op)(expression, parameter_filter.value)
+
+
+def _well_condition(parameter_filter: schemas.WellFilter) -> ColumnElement:
+    """well parameters are free-form, so these are not indexed; strings compare as they are, numbers as numbers"""
+    value = func.json_extract(Well.parameters, f'$."{parameter_filter.key}"')
+    if isinstance(parameter_filter.value, float) or parameter_filter.op in ('lt', 'le', 'gt', 'ge'):
+        value = cast(value, REAL)
+    return _condition(value, parameter_filter)
+
+
+def _days(parameters: dict, key: str) -> float:
+    """an hours parameter in days, missing or malformed values count as zero"""
+    try:
+        return float(parameters.get(key) or 0) / 24
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _accumulate(operations: list[Operation], start: int, stop: int):
+    """recomputes running totals of operations[start:stop] continuing from the one before start"""
+    planned_days = operations[start - 1].planned_days if start > 0 else 0.0
+    actual_days = operations[start - 1].actual_days if start > 0 else 0.0
+    for operation in operations[start:stop]:
+        planned_days += _days(operation.parameters, 'plannedTime')
+        actual_days += _days(operation.parameters, 'actualTime')
+        operation.planned_days = planned_days
+        operation.actual_days = actual_days
+
+
+# Operation.order is a sparse key: operations are ORDER_STEP apart when appended or rebalanced, and a moved
+# operation takes the midpoint of its new neighbours, so a move rewrites one key instead of the whole event.
+ORDER_STEP = 1 << 16
+# a move leaving a smaller gap schedules a rebalance of the event
+ORDER_MIN_GAP = 16
+
+
+def _append_rows(rows: list[dict], tail: tuple[int, float, float]) -> tuple[int, float, float]:
+    """gives rows increasing orders and running totals after tail, returns the new tail"""
+    last_order, planned_days, actual_days = tail
+    for row in rows:
+        last_order += ORDER_STEP
+        planned_days += _days(row['parameters'], 'plannedTime')
+        actual_days += _days(row['parameters'], 'actualTime')
+        row |= {'order': last_order, 'planned_days': planned_days, 'actual_days': actual_days}
+    return last_order, planned_days, actual_days
+
+
+async def _allocate_ids(db: AsyncSession, model, rows: list[dict]) -> list[int]:
+    """numbers rows after the largest id, as SQLite would, so that their ids are known to follow their order
+    rather than the order RETURNING yields them in; the writer's transaction holds the database lock meanwhile"""
+    first = (await db.execute(select(func.coalesce(func.max(model.id), 0)))).scalar_one() + 1
+    for id, row in enumerate(rows, first):
+        row['id'] = id
+    return [row['id'] for row in rows]
+
+
+async def _get_tails(db: AsyncSession, event_ids: set[int]) -> dict[int, tuple[int, float, float]]:
+    """(order, planned_days, actual_days) of the last operation of every event, (-ORDER_STEP, 0, 0) for empty ones"""
+    tails = dict.fromkeys(event_ids, (-ORDER_STEP, 0.0, 0.0))
+    # SQLite takes the bare columns from the row max() picked
+    rows = await db.execute(
+        select(Operation.event_id, func.max(Operation.order), Operation.planned_days, Operation.actual_days)
+        .where(Operation.event_id.in_(event_ids))
+        .group_by(Operation.event_id)
+    )
+    tails |= {event_id: (order, planned_days, actual_days) for event_id, order, planned_days, actual_days in rows}
+    return tails
 
 
 async def get_user_by_username(db: AsyncSession, username: str) -> User | None:
-    res = (await db.execute(select(User).where(User.username == username))).scalars().unique().one_or_none()
+    res = (await db.execute(select(User).where(User.username == username).options(raiseload('*')))).scalars().unique().one_or_none()
     return res
 
 
 async def create_user(db: AsyncSession, user: schemas.User) -> User:
-    hashed_password = get_hash_password(user.password)
+    hashed_password = await get_hash_password(user.password)
     db_user = User(
         username=user.username,
         password=hashed_password,
@@ -23,26 +135,71 @@ async def create_user(db: AsyncSession, user: schemas.User) -> User:
     )
     db.add(db_user)
     await db.commit()
+    await forget_user(db_user.username)
     await db.refresh(db_user)
     return db_user
 
 
+async def update_password_hash(db: AsyncSession, username: str, hashed_password: str):
+    await db.execute(update(User).where(User.username == username).values(password=hashed_password))
+    await db.commit()
+    await forget_user(username)
+
+
 async def create_field(db: AsyncSession, field: schemas.FieldBase) -> Field:
     db_field = Field(
         name=field.name
     )
     db.add(db_field)
     await db.commit()
+    await cache.invalidate(cache.FIELDS)
     await db.refresh(db_field)
     return db_field
 
 
 async def get_fields(db: AsyncSession) -> Sequence[Field]:
-    return (await db.execute(select(Field))).scalars().unique().unique().all()
+    """in the order of stream_field_tree: fields by name, then the ids of bushes, wells and events (the
+    order of the relationships), then the order of the operations"""
+    return (await db.execute(select(Field).order_by(Field.name).options(FIELD_TREE))).scalars().all()
+
+
+async def get_fields_page(db: AsyncSession, cursor: str | None, limit: int, depth: int) -> Sequence[Field]:
+    query = select(Field).order_by(Field.name).limit(limit).options(*subtree(0, depth))
+    if cursor is not None:
+        query = query.where(Field.name > cursor)
+    return (await db.execute(query)).scalars().all()
+
+
+EVENT_COLUMNS = (
+    Event.id.label('event_id'), Event.name.label('event_name'), Event.description.label('event_description'),
+)
+OPERATION_COLUMNS = (
+    Operation.id.label('operation_id'), Operation.order.label('operation_order'),
+    Operation.name.label('operation_name'), Operation.parameters.label('operation_parameters'),
+    Operation.is_complete.label('operation_is_complete'), Operation.version.label('operation_version'),
+)
+
+
+async def stream_field_tree(db: AsyncSession) -> AsyncResult:
+    """one flat row per operation (or childless node), in tree order, through a server-side cursor"""
+    query = select(
+        Field.name.label('field_name'),
+        Bush.id.label('bush_id'), Bush.name.label('bush_name'),
+        Well.id.label('well_id'), Well.name.label('well_name'), Well.parameters.label('well_parameters'),
+        Well.version.label('well_version'),
+        *EVENT_COLUMNS, *OPERATION_COLUMNS
+    ) \
+        .outerjoin(Bush, Bush.field_name == Field.name) \
+        .outerjoin(Well, Well.bush_id == Bush.id) \
+        .outerjoin(Event, Event.well_id == Well.id) \
+        .outerjoin(Operation, Operation.event_id == Event.id) \
+        .order_by(Field.name, Bush.id, Well.id, Event.id, Operation.order) \
+        .execution_options(yield_per=500)
+    return await db.stream(query)
 
 
 async def get_field_by_name(db: AsyncSession, name: str) -> Field | None:
-    return (await db.execute(select(Field).where(Field.name == name))).scalars().unique().one_or_none()
+    return (await db.execute(select(Field).where(Field.name == name).options(raiseload('*')))).scalars().unique().one_or_none()
 
 
 async def create_bush(db: AsyncSession, bush: schemas.BushCreate) -> Bush | None:
@@ -53,15 +210,24 @@ async def create_bush(db: AsyncSession, bush: schemas.BushCreate) -> Bush | None
         name=bush.name,
         field_name=bush.field_name
     )
-    field.bushes.append(db_bush)
     db.add(db_bush)
     await db.commit()
+    await cache.invalidate(cache.FIELDS)
     await db.refresh(db_bush)
     return db_bush
 
 
 async def get_bush_by_id(db: AsyncSession, id: int) -> Bush | None:
-    return (await db.execute(select(Bush).where(Bush.id == id))).scalars().unique().one_or_none()
+    return (await db.execute(select(Bush).where(Bush.id == id).options(raiseload('*')))).scalars().unique().one_or_none()
+
+
+async def get_bushes_page(db: AsyncSession, field_name: str, cursor: int | None, limit: int,
+                          depth: int) -> Sequence[Bush]:
+    query = select(Bush).where(Bush.field_name == field_name).order_by(Bush.id).limit(limit) \
+        .options(*subtree(1, depth))
+    if cursor is not None:
+        query = query.where(Bush.id > cursor)
+    return (await db.execute(query)).scalars().all()
 
 
 async def create_well(db: AsyncSession, well: schemas.WellCreate) -> Well | None:
@@ -74,23 +240,67 @@ async def create_well(db: AsyncSession, well: schemas.WellCreate) -> Well | None
         bush_id=well.bush_id,
     )
     db.add(db_well)
-    bush.wells.append(db_well)
     await db.commit()
+    await cache.invalidate(cache.FIELDS)
     await db.refresh(db_well)
     return db_well
 
 
+async def create_wells(db: AsyncSession, wells: list[schemas.WellCreate]) -> list[int] | None:
+    bush_ids = {well.bush_id for well in wells}
+    found = (await db.execute(select(Bush.id).where(Bush.id.in_(bush_ids)))).scalars().all()
+    if len(found) != len(bush_ids):
+        return None
+    if not wells:
+        return []
+    rows = [well.dict() for well in wells]
+    ids = await _allocate_ids(db, Well, rows)
+    await db.execute(insert(Well), rows)
+    await db.commit()
+    await cache.invalidate(cache.FIELDS)
+    return ids
+
+
 async def get_well_by_id(db: AsyncSession, id: int) -> Well | None:
-    return (await db.execute(select(Well).where(Well.id == id))).scalars().unique().one_or_none()
+    return (await db.execute(select(Well).where(Well.id == id).options(raiseload('*')))).scalars().unique().one_or_none()
 
 
-async def update_parameters_of_well(db: AsyncSession, well_id: int, new_parameters: dict) -> Well | None:
+async def get_wells_page(db: AsyncSession, bush_id: int, cursor: int | None, limit: int,
+                         depth: int) -> Sequence[Well]:
+    query = select(Well).where(Well.bush_id == bush_id).order_by(Well.id).limit(limit) \
+        .options(*subtree(2, depth))
+    if cursor is not None:
+        query = query.where(Well.id > cursor)
+    return (await db.execute(query)).scalars().all()
+
+
+def _mark_stale(db: AsyncSession, *keys: str):
+    db.info.setdefault("stale_keys", set()).update(keys)
+
+
+async def invalidate_stale(db: AsyncSession):
+    """drops the cache entries marked stale by the stage_* functions, to be called once they are committed"""
+    await cache.invalidate(*db.info.pop("stale_keys", ()))
+
+
+async def stage_parameters_of_well(db: AsyncSession, well_id: int, new_parameters: dict) -> Well | None:
+    """update_parameters_of_well without the commit, so several of them can share a transaction"""
     well = await get_well_by_id(db, well_id)
     if well is None:
         return None
-    well.parameters |= new_parameters
+    well.parameters = well.parameters | new_parameters
+    well.version += 1
+    await db.flush()
+    _mark_stale(db, cache.FIELDS)
+    return well
+
+
+async def update_parameters_of_well(db: AsyncSession, well_id: int, new_parameters: dict) -> Well | None:
+    well = await stage_parameters_of_well(db, well_id, new_parameters)
+    if well is None:
+        return None
     await db.commit()
-    await db.refresh(well)
+    await invalidate_stale(db)
     return well
 
 
@@ -104,14 +314,108 @@ async def create_event(db: AsyncSession, event: schemas.EventCreate) -> Event |
         well_id=event.well_id
     )
     db.add(db_event)
-    well.events.append(db_event)
     await db.commit()
+    await cache.invalidate(cache.FIELDS)
     await db.refresh(db_event)
     return db_event
 
 
+async def create_events(db: AsyncSession, events: list[schemas.EventCreate]) -> list[int] | None:
+    well_ids = {event.well_id for event in events}
+    found = (await db.execute(select(Well.id).where(Well.id.in_(well_ids)))).scalars().all()
+    if len(found) != len(well_ids):
+        return None
+    if not events:
+        return []
+    rows = [event.dict() for event in events]
+    ids = await _allocate_ids(db, Event, rows)
+    await db.execute(insert(Event), rows)
+    await db.commit()
+    await cache.invalidate(cache.FIELDS)
+    return ids
+
+
 async def get_event_by_id(db: AsyncSession, id: int) -> Event | None:
-    return (await db.execute(select(Event).where(Event.id == id))).scalars().unique().one_or_none()
+    return (await db.execute(select(Event).where(Event.id == id).options(selectinload(Event.operations), raiseload('*')))).scalars().unique().one_or_none()
+
+
+async def get_event_rows(db: AsyncSession, id: int):
+    """the event's columns joined with each of its operations in order, one row with null operation columns
+    if it has none and no rows if there is no such event"""
+    return await db.execute(
+        select(*EVENT_COLUMNS, *OPERATION_COLUMNS)
+        .outerjoin(Operation, Operation.event_id == Event.id)
+        .where(Event.id == id)
+        .order_by(Operation.order)
+    )
+
+
+async def get_events_page(db: AsyncSession, well_id: int, cursor: int | None, limit: int,
+                          depth: int) -> Sequence[Event]:
+    query = select(Event).where(Event.well_id == well_id).order_by(Event.id).limit(limit) \
+        .options(*subtree(3, depth))
+    if cursor is not None:
+        query = query.where(Event.id > cursor)
+    return (await db.execute(query)).scalars().all()
+
+
+async def get_events_of_bush(db: AsyncSession, bush_id: int) -> Sequence[Event]:
+    """events of every well of the bush with their wells and operations, in two queries"""
+    query = select(Event).join(Event.well).where(Well.bush_id == bush_id).order_by(Well.id, Event.id) \
+        .options(contains_eager(Event.well), selectinload(Event.operations), raiseload('*'))
+    return (await db.execute(query)).scalars().all()
+
+
+async def get_events_of_field(db: AsyncSession, field_name: str) -> Sequence[Event]:
+    """events of every well of the field with their wells and operations, in two queries"""
+    query = select(Event).join(Event.well).join(Well.bush).where(Bush.field_name == field_name) \
+        .order_by(Bush.id, Well.id, Event.id) \
+        .options(contains_eager(Event.well), selectinload(Event.operations), raiseload('*'))
+    return (await db.execute(query)).scalars().all()
+
+
+def _depth(key: str) -> ColumnElement:
+    """a depth parameter of an operation, missing or malformed values count as zero like _days does"""
+    return func.coalesce(_number(Operation.parameters, key), 0.0)
+
+
+async def get_curve_columns(db: AsyncSession, event_id: int) -> list | None:
+    """planned days, plannedDepth, actual days, actualDepth of the event's operations in order"""
+    rows = (await db.execute(
+        select(
+            Operation.planned_days,
+            _depth('plannedDepth'),
+            Operation.actual_days,
+            _depth('actualDepth'),
+        ).where(Operation.event_id == event_id).order_by(Operation.order)
+    )).all()
+    if not rows and (await db.execute(select(Event.id).where(Event.id == event_id))).scalar_one_or_none() is None:
+        return None
+    return rows
+
+
+async def get_curve_columns_of_scope(db: AsyncSession, well_id: int | None = None, bush_id: int | None = None,
+                                     field_name: str | None = None) -> tuple[Sequence[int], list]:
+    """ids of the events in scope and (event_id, get_curve_columns...) rows of all their operations,
+    ordered by (event_id, order)"""
+    events = select(Event.id)
+    if well_id is not None:
+        events = events.where(Event.well_id == well_id)
+    if bush_id is not None:
+        events = events.join(Event.well).where(Well.bush_id == bush_id)
+    if field_name is not None:
+        events = events.join(Event.well).join(Well.bush).where(Bush.field_name == field_name)
+    event_ids = (await db.execute(events.order_by(Event.id))).scalars().all()
+    rows = (await db.execute(
+        select(
+            Operation.event_id,
+            Operation.planned_days,
+            _depth('plannedDepth'),
+            Operation.actual_days,
+            _depth('actualDepth'),
+        ).where(Operation.event_id.in_(events)).order_by(Operation.event_id, Operation.order)
+    )).all()
+    return event_ids, rows
 
 
 async def update_operation_order_for_event(db: AsyncSession, event_id: int, new_order: list[int]) -> Event | str:
@@ -128,59 +432,334 @@ async def update_operation_order_for_event(db: AsyncSession, event_id: int, new_
             or len(set(new_order)) != operations_count \
             or not are_indices_valid:
         return "Неверно задан порядок"
+    moved = [i for i in range(operations_count) if new_order[i] != i]
     for i in range(operations_count):
-        event.operations[i].order = new_order[i]
-    event.operations.reorder()
+        event.operations[i].order = new_order[i] * ORDER_STEP
+    event.operations.sort(key=lambda operation: operation.order)
+    if moved:
+        # operations outside of the moved range keep their positions and so their running totals
+        _accumulate(event.operations, moved[0], moved[-1] + 1)
     await db.commit()
+    await cache.invalidate_event(event_id)
     await db.refresh(event)
     return event
 
 
 async def create_operation(db: AsyncSession, operation: schemas.OperationCreate) -> Operation | None:
-    event = await get_event_by_id(db, operation.event_id)
-    if event is None:
+    if (await db.execute(select(Event.id).where(Event.id == operation.event_id))).scalar_one_or_none() is None:
         return None
-    db_operation = Operation(
-        name=operation.name,
-        parameters=operation.parameters,
-        is_complete=operation.is_complete,
-        event_id=operation.event_id
-    )
+    row = operation.dict()
+    _append_rows([row], (await _get_tails(db, {operation.event_id}))[operation.event_id])
+    db_operation = Operation(**row)
     db.add(db_operation)
-    event.operations.append(db_operation)
-    event.operations.reorder()
     await db.commit()
+    await cache.invalidate_event(operation.event_id)
     await db.refresh(db_operation)
     return db_operation
 
 
-async def update_parameters_of_operation(db: AsyncSession, operation_id: int, new_parameters: dict) -> Operation | None:
+async def create_operations(db: AsyncSession, operations: list[schemas.OperationCreate]) -> list[int] | None:
+    """appends operations to the end of their events, keeping the order they are given in"""
+    event_ids = {operation.event_id for operation in operations}
+    found = (await db.execute(select(Event.id).where(Event.id.in_(event_ids)))).scalars().all()
+    if len(found) != len(event_ids):
+        return None
+    if not operations:
+        return []
+    tails = await _get_tails(db, event_ids)
+    rows = []
+    for operation in operations:
+        row = operation.dict()
+        tails[operation.event_id] = _append_rows([row], tails[operation.event_id])
+        rows.append(row)
+    ids = await _allocate_ids(db, Operation, rows)
+    await db.execute(insert(Operation), rows)
+    await db.commit()
+    for event_id in event_ids:
+        await cache.invalidate_event(event_id)
+    return ids
+
+
+async def import_operations(db: AsyncSession, event_id: int, chunks: AsyncIterator[list[dict]]) -> int | None:
+    """appends operations chunk by chunk to the end of the event, all in one transaction"""
+    if (await db.execute(select(Event.id).where(Event.id == event_id))).scalar_one_or_none() is None:
+        return None
+    tail = (await _get_tails(db, {event_id}))[event_id]
+    count = 0
+    try:
+        async for chunk in chunks:
+            rows = [operation | {'event_id': event_id} for operation in chunk]
+            tail = _append_rows(rows, tail)
+            await db.execute(insert(Operation), rows)
+            count += len(rows)
+    except Exception:
+        await db.rollback()
+        raise
+    await db.commit()
+    await cache.invalidate_event(event_id)
+    return count
+
+
+async def stage_parameters_of_operation(db: AsyncSession, operation_id: int,
+                                        new_parameters: dict) -> Operation | None:
+    """update_parameters_of_operation without the commit, so several of them can share a transaction"""
     operation = await get_operation_by_id(db, operation_id)
     if operation is None:
         return None
-    operation.parameters |= new_parameters
-    await db.commit()
+    planned_delta = _days(new_parameters, 'plannedTime') - _days(operation.parameters, 'plannedTime') \
+        if 'plannedTime' in new_parameters else 0.0
+    actual_delta = _days(new_parameters, 'actualTime') - _days(operation.parameters, 'actualTime') \
+        if 'actualTime' in new_parameters else 0.0
+    operation.parameters = operation.parameters | new_parameters
+    operation.version += 1
+    # only this operation and the ones after it change their running totals
+    await _shift_totals(db, operation.event_id, operation.order, None, planned_delta, actual_delta, inclusive=True)
+    await db.flush()
     await db.refresh(operation)
+    _mark_stale(db, *cache.event_keys(operation.event_id))
     return operation
 
 
-async def delete_operation(db: AsyncSession, operation_id: int) -> Event | None:
+async def update_parameters_of_operation(db: AsyncSession, operation_id: int, new_parameters: dict) -> Operation | None:
+    operation = await stage_parameters_of_operation(db, operation_id, new_parameters)
+    if operation is None:
+        return None
+    await db.commit()
+    await invalidate_stale(db)
+    return operation
+
+
+async def _shift_totals(db: AsyncSession, event_id: int, after: int, before: int | None,
+                        planned_days: float, actual_days: float, inclusive: bool = False):
+    """adds to the running totals of the operations with after < order < before, or after <= order if inclusive"""
+    if not planned_days and not actual_days:
+        return
+    condition = (Operation.event_id == event_id, Operation.order >= after if inclusive else Operation.order > after)
+    if before is not None:
+        condition += (Operation.order < before,)
+    await db.execute(
+        update(Operation)
+        .where(*condition)
+        .values(planned_days=Operation.planned_days + planned_days,
+                actual_days=Operation.actual_days + actual_days)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+async def delete_operation(db: AsyncSession, operation_id: int) -> int | None:
+    """returns the ID of the event the operation was deleted from"""
     operation = await get_operation_by_id(db, operation_id)
     if operation is None:
         return None
-    event = await get_event_by_id(db, operation.event_id)
-    if event is None:
-        raise RuntimeError("Event not found, even though operation did? o_0")
-    event.operations.pop(index=operation.order)
-    event.operations.reorder()
+    # the rest keep their order keys, only the totals after the operation lose its time
+    await _shift_totals(db, operation.event_id, operation.order, None,
+                        -_days(operation.parameters, 'plannedTime'), -_days(operation.parameters, 'actualTime'))
     await db.delete(operation)
     await db.commit()
-    await db.refresh(event)
-    return event
+    await cache.invalidate_event(operation.event_id)
+    return operation.event_id
+
+
+async def _neighbour(db: AsyncSession, operation: Operation, order: int, before: bool) -> Operation | None:
+    """the closest operation of the event before or after order, other than operation"""
+    query = select(Operation).where(Operation.event_id == operation.event_id, Operation.id != operation.id) \
+        .options(raiseload('*')).limit(1)
+    if before:
+        query = query.where(Operation.order < order).order_by(Operation.order.desc())
+    else:
+        query = query.where(Operation.order > order).order_by(Operation.order)
+    return (await db.execute(query)).scalar_one_or_none()
+
+
+async def move_operation(db: AsyncSession, operation_id: int, before_id: int | None,
+                         after_id: int | None) -> Operation | str:
+    """puts the operation right before before_id or right after after_id
+
+    Only the operation gets a new order key. The running totals of the operations it passes over are
+    shifted by its own time with a single UPDATE."""
+    if (before_id is None) == (after_id is None):
+        return "Укажите ровно одно из before_id, after_id"
+    operation = await get_operation_by_id(db, operation_id)
+    if operation is None:
+        return "Нет такой операции"
+    anchor = await get_operation_by_id(db, before_id if after_id is None else after_id)
+    if anchor is None or anchor.event_id != operation.event_id or anchor.id == operation.id:
+        return "Неверно задана соседняя операция"
+    if after_id is None:
+        previous, following = await _neighbour(db, operation, anchor.order, True), anchor
+    else:
+        previous, following = anchor, await _neighbour(db, operation, anchor.order, False)
+    if previous is not None and following is not None and following.order - previous.order < 2:
+        await rebalance_event_order(db, operation.event_id)
+        return await move_operation(db, operation_id, before_id, after_id)
+    if previous is None:
+        order = following.order - ORDER_STEP
+    elif following is None:
+        order = previous.order + ORDER_STEP
+    else:
+        order = (previous.order + following.order) // 2
+        if following.order - previous.order < ORDER_MIN_GAP:
+            db.info.setdefault("crowded_events", set()).add(operation.event_id)
+    planned_days = _days(operation.parameters, 'plannedTime')
+    actual_days = _days(operation.parameters, 'actualTime')
+    if order > operation.order:
+        await _shift_totals(db, operation.event_id, operation.order, order, -planned_days, -actual_days)
+    else:
+        await _shift_totals(db, operation.event_id, order, operation.order, planned_days, actual_days)
+    operation.order = order
+    operation.planned_days = (previous.planned_days if previous is not None else 0.0) + planned_days
+    operation.actual_days = (previous.actual_days if previous is not None else 0.0) + actual_days
+    await db.commit()
+    await cache.invalidate_event(operation.event_id)
+    return operation
+
+
+async def rebalance_event_order(db: AsyncSession, event_id: int):
+    """spreads the order keys of the event ORDER_STEP apart again, the order itself does not change"""
+    ids = (await db.execute(
+        select(Operation.id).where(Operation.event_id == event_id).order_by(Operation.order)
+    )).scalars().all()
+    if ids:
+        await db.execute(update(Operation), [
+            {'id': id, 'order': position * ORDER_STEP} for position, id in enumerate(ids)
+        ])
+    # loaded operations hold the old keys
+    db.expire_all()
+    await db.commit()
+    await cache.invalidate_event(event_id)
+
+
+def pop_crowded_events(db: AsyncSession) -> set[int]:
+    """events whose order keys got close enough to be worth a rebalance, see move_operation"""
+    return db.info.pop("crowded_events", set())
+
+
+class VersionConflict(Exception):
+    """the row has changed since the version the client based its change on"""
+
+
+async def _patch_parameters(db: AsyncSession, model: type[Well] | type[Operation], id: int, patch: dict,
+                            version: int | None) -> tuple[int, dict] | None:
+    """merges patch into the parameters inside SQLite (RFC 7396, a null value deletes the key) and bumps the
+    version, the row is never loaded; returns the new (version, parameters)"""
+    query = update(model).where(model.id == id) \
+        .values(parameters=func.json_patch(model.parameters, json.dumps(patch, ensure_ascii=False)),
+                version=model.version + 1) \
+        .returning(model.version, model.parameters) \
+        .execution_options(synchronize_session=False)
+    if version is not None:
+        query = query.where(model.version == version)
+    row = (await db.execute(query)).one_or_none()
+    if row is None:
+        if (await db.execute(select(model.id).where(model.id == id))).scalar_one_or_none() is not None:
+            raise VersionConflict()
+        return None
+    # synchronize_session="fetch" fails on the JSON column, so a copy of the row loaded by the session is
+    # brought up to date here
+    loaded = db.identity_map.get(db.identity_key(model, id))
+    if loaded is not None:
+        set_committed_value(loaded, 'version', row.version)
+        set_committed_value(loaded, 'parameters', row.parameters)
+    return row.version, row.parameters
+
+
+async def patch_parameters_of_well(db: AsyncSession, well_id: int, patch: dict,
+                                   version: int | None = None) -> tuple[int, dict] | None:
+    res = await _patch_parameters(db, Well, well_id, patch, version)
+    if res is None:
+        return None
+    await db.commit()
+    await cache.invalidate(cache.FIELDS)
+    return res
+
+
+async def patch_parameters_of_operation(db: AsyncSession, operation_id: int, patch: dict,
+                                        version: int | None = None) -> tuple[int, dict] | None:
+    times = ('plannedTime', 'actualTime')
+    # only the two times are read back, and only when the patch changes one of them
+    old = (await db.execute(
+        select(Operation.event_id, Operation.order,
+               *(func.json_extract(Operation.parameters, f'$.{key}') for key in times))
+        .where(Operation.id == operation_id)
+    )).one_or_none()
+    if old is None:
+        return None
+    event_id, order, *old_times = old
+    res = await _patch_parameters(db, Operation, operation_id, patch, version)
+    if res is None:
+        return None
+    if any(key in patch for key in times):
+        old_parameters = dict(zip(times, old_times))
+        await _shift_totals(db, event_id, order, None, *(
+            _days(res[1], key) - _days(old_parameters, key) for key in times
+        ), inclusive=True)
+    await db.commit()
+    await cache.invalidate_event(event_id)
+    return res
 
 
 async def get_operation_by_id(db: AsyncSession, id: int) -> Operation | None:
-    return (await db.execute(select(Operation).where(Operation.id == id))).scalars().unique().one_or_none()
+    return (await db.execute(select(Operation).where(Operation.id == id).options(raiseload('*')))).scalars().unique().one_or_none()
+
+
+async def get_operations_page(db: AsyncSession, event_id: int, cursor: int | None,
+                              limit: int) -> Sequence[Operation]:
+    query = select(Operation).where(Operation.event_id == event_id).order_by(Operation.order).limit(limit) \
+        .options(raiseload('*'))
+    if cursor is not None:
+        query = query.where(Operation.order > cursor)
+    return (await db.execute(query)).scalars().all()
+
+
+def _sort_key(search: schemas.OperationSearch) -> ColumnElement | None:
+    """the expression of the first range filter, pages follow it so that SQLite walks its index in order
+    instead of scanning the table by id and filtering"""
+    for parameter_filter in search.filters:
+        if parameter_filter.op in ('lt', 'le', 'gt', 'ge'):
+            return OPERATION_PARAMETERS[parameter_filter.key]
+    return None
+
+
+def search_cursor(operation: Operation, sort_key: float | None) -> str:
+    """the cursor of the page after this search result, `id` or `sort key:id`"""
+    return str(operation.id) if sort_key is None else f"{sort_key!r}:{operation.id}"
+
+
+def _parse_search_cursor(cursor: str) -> tuple[float | None, int]:
+    """raises ValueError for a cursor search_cursor did not make"""
+    sort_key, _, id = cursor.rpartition(':')
+    return (float(sort_key) if sort_key else None), int(id)
+
+
+async def search_operations(db: AsyncSession, search: schemas.OperationSearch, cursor: str | None,
+                            limit: int) -> Sequence:
+    """(operation, sort key) rows of a page of the operations matching the search, the sort key is None
+    without a range filter; raises ValueError for a malformed cursor"""
+    sort_key = _sort_key(search)
+    query = select(Operation, (sort_key if sort_key is not None else literal_column('NULL')).label('sort_key')) \
+        .limit(limit).options(raiseload('*')) \
+        .where(*(_condition(OPERATION_PARAMETERS[f.key], f) for f in search.filters))
+    query = query.order_by(Operation.id) if sort_key is None else query.order_by(sort_key, Operation.id)
+    if search.event_id is not None:
+        query = query.where(Operation.event_id == search.event_id)
+    if cursor is not None:
+        after, id = _parse_search_cursor(cursor)
+        if sort_key is None or after is None:
+            query = query.where(Operation.id > id)
+        else:
+            query = query.where(sort_key >= after, (sort_key > after) | (Operation.id > id))
+    return (await db.execute(query)).all()
+
+
+async def search_wells(db: AsyncSession, search: schemas.WellSearch, cursor: int | None,
+                       limit: int) -> Sequence[Well]:
+    query = select(Well).order_by(Well.id).limit(limit).options(raiseload('*')) \
+        .where(*(_well_condition(f) for f in search.filters))
+    if search.bush_id is not None:
+        query = query.where(Well.bush_id == search.bush_id)
+    if cursor is not None:
+        query = query.where(Well.id > cursor)
+    return (await db.execute(query)).scalars().all()
 
 
 async def create_example_operation(db: AsyncSession, operation: schemas.ExampleOperationCreate) -> ExampleOperation:
@@ -200,3 +779,59 @@ async def get_example_operation_by_id(db: AsyncSession, id: int) -> ExampleOpera
 
 async def get_example_operations_by_name(db: AsyncSession, name: str) -> Sequence[ExampleOperation]:
     return (await db.execute(select(ExampleOperation).where(ExampleOperation.name == name))).scalars().unique().all()
+
+
+# full-text indexes of names, see migration 8: the rowid of a row is its search key, the length of its name
+# above the id, so matches come out of the index shortest name first
+EXAMPLE_OPERATIONS_SEARCH = table("ExampleOperationsSearch", column("rowid"))
+OPERATIONS_SEARCH = table("OperationsSearch", column("rowid"))
+SEARCH_KEY_IDS = 1 << 32
+SEARCH_CANDIDATES = 200
+
+
+def _match_query(query: str) -> str | None:
+    """every word of the query as a quoted prefix, so "бур скв" finds "Бурение скважины" and no input is FTS syntax"""
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _shortest_matches(search, limit: int):
+    """search keys of the first limit matches, read in index order, so the cost doesn't grow with the number of matches"""
+    return select(search.c.rowid.label("key")) \
+        .where(text(f'"{search.name}" MATCH :match')) \
+        .order_by(search.c.rowid).limit(limit).subquery()
+
+
+async def search_names(db: AsyncSession, query: str, limit: int) -> list[tuple[str, ExampleOperation | None]]:
+    """example operations and names of existing operations matching query, shortest names first;
+    a name that is also an example operation is returned once, with the example
+
+    Names of operations repeat, they are grouped among their SEARCH_CANDIDATES shortest matches only,
+    so a name repeated more often than that can hide longer ones."""
+    match = _match_query(query)
+    if match is None:
+        return []
+    examples = _shortest_matches(EXAMPLE_OPERATIONS_SEARCH, limit)
+    examples = await db.execute(
+        select(ExampleOperation, examples.c.key)
+        .join(examples, ExampleOperation.id == examples.c.key % SEARCH_KEY_IDS)
+        .order_by(examples.c.key),
+        {'match': match}
+    )
+    names = _shortest_matches(OPERATIONS_SEARCH, SEARCH_CANDIDATES)
+    key = func.min(names.c.key)
+    names = await db.execute(
+        select(Operation.name, key)
+        .join(names, Operation.id == names.c.key % SEARCH_KEY_IDS)
+        .group_by(Operation.name).order_by(key).limit(limit),
+        {'match': match}
+    )
+    found: dict[str, tuple[int, ExampleOperation | None]] = {}
+    for example, example_key in examples:
+        found.setdefault(example.name, (example_key, example))
+    for name, name_key in names:
+        found.setdefault(name, (name_key, None))
+    ranked = sorted(found.items(), key=lambda item: item[1][0])[:limit]
+    return [(name, example) for name, (_, example) in ranked]
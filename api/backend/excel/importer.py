@@ -0,0 +1,53 @@
+from typing import BinaryIO, Iterator
+from zipfile import BadZipFile
+import openpyxl
+from openpyxl.utils.exceptions import InvalidFileException
+
+FIRST_ROW = 9
+NAME_COLUMN = 1
+# column index -> operation parameter, the inverse of what Excel.create_section writes
+PARAMETER_COLUMNS = {
+    2: "plannedTime",
+    4: "plannedDepth",
+    5: "actualTime",
+    7: "actualDepth",
+    10: "plannedNpt",
+    13: "nptComment",
+    14: "actualIlt",
+    17: "iltComment",
+}
+REQUIRED_PARAMETERS = ("plannedTime", "plannedDepth", "actualTime", "actualDepth")
+
+
+class WorkbookError(ValueError):
+    pass
+
+
+def read_operations(file: BinaryIO, chunk_size: int = 1000) -> Iterator[list[dict]]:
+    """streams operations of a workbook in the pattern.xlsx layout in chunks of at most chunk_size"""
+    try:
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except (InvalidFileException, BadZipFile) as e:
+        raise WorkbookError("Файл не является книгой Excel") from e
+    try:
+        chunk = []
+        for row_number, row in enumerate(wb.active.iter_rows(min_row=FIRST_ROW, values_only=True), FIRST_ROW):
+            name = row[NAME_COLUMN] if len(row) > NAME_COLUMN else None
+            if name is None or str(name).strip() == "":
+                continue
+            parameters = {
+                parameter: row[column]
+                for column, parameter in PARAMETER_COLUMNS.items()
+                if column < len(row) and row[column] is not None
+            }
+            missing = [parameter for parameter in REQUIRED_PARAMETERS if parameter not in parameters]
+            if missing:
+                raise WorkbookError(f"Строка {row_number}: не заполнены {', '.join(missing)}")
+            chunk.append({"name": str(name), "parameters": parameters, "is_complete": False})
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        wb.close()
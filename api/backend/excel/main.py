@@ -1,5 +1,6 @@
+from copy import copy
 import openpyxl
-from openpyxl.styles import Alignment, Font
+from excel.rows import DEFAULT_FONT, RowTemplate, register_styles
 
 
 class Excel:
@@ -8,6 +9,7 @@ class Excel:
         self.file_name = file_name
         self.wb = openpyxl.Workbook()
         self.ws = self.wb.active
+        self.rows: RowTemplate | None = None
 
     def get_pattern(self, pattern_name: str):
         """takes an excel file pattern"""
@@ -19,106 +21,19 @@ class Excel:
         """saves the file"""
         self.wb.save(self.file_name)
 
-    def __create_cells(self, cell: str, value, **kwargs):
-        """creating a cell according to the specified parameters"""
-        self.ws[cell].value = value
-        if "merge_cell" in kwargs.keys():
-            self.ws.merge_cells(f"{cell}:{kwargs['merge_cell']}")
-        if "font" in kwargs.keys():
-            self.ws[cell].font = kwargs["font"]
-        if "alignment" in kwargs.keys():
-            self.ws[cell].alignment = kwargs["alignment"]
-        return {cell, value}
-
-    def create_section(self, dict_sec: list, font_=Font(size=10, bold=False)):
+    def create_section(self, dict_sec: list, font_=DEFAULT_FONT, computed: bool = False):
         """recording operations in an excel file"""
+        column_styles = []
+        for column, style in enumerate(register_styles(self.wb, font_), 1):
+            cell = self.ws.cell(row=self.numb_in_sec, column=column)
+            cell.style = style
+            column_styles.append(cell._style)
+        if self.rows is None or self.rows.row != self.numb_in_sec or self.rows.computed != computed:
+            self.rows = RowTemplate(self.numb_in_sec, computed)
         for elem in dict_sec:
-            string = elem["parameters"]
-            self.__create_cells(f"A{self.numb_in_sec}", elem["id"], font=font_,
-                                alignment=Alignment(horizontal="center", vertical="center"))
-            self.__create_cells(f"B{self.numb_in_sec}", elem["name"], font=font_,
-                                alignment=Alignment(vertical="center"))
-            self.__create_cells(f"C{self.numb_in_sec}", string["plannedTime"], font=font_,
-                                alignment=Alignment(vertical="center", horizontal="center"))
-
-            if str(self.ws[f"D{self.numb_in_sec - 1}"].value).replace(".", "", 1).isdigit():
-                self.__create_cells(f"D{self.numb_in_sec}", f"=C{self.numb_in_sec}/24+D{self.numb_in_sec - 1}",
-                                    font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-            else:
-                self.__create_cells(f"D{self.numb_in_sec}", f"=C{self.numb_in_sec}/24", font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-
-            self.__create_cells(f"E{self.numb_in_sec}", string["plannedDepth"], font=font_,
-                                alignment=Alignment(vertical="center", horizontal="center"))
-            self.__create_cells(f"F{self.numb_in_sec}", string["actualTime"], font=font_,
-                                alignment=Alignment(vertical="center", horizontal="center"))
-
-            if str(self.ws[f"G{self.numb_in_sec - 1}"].value).replace(".", "", 1).isdigit():
-                self.__create_cells(f"G{self.numb_in_sec}", f"=F{self.numb_in_sec}/24+G{self.numb_in_sec - 1}",
-                                    font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-            else:
-                self.__create_cells(f"G{self.numb_in_sec}", f"=F{self.numb_in_sec}/24", font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-
-            self.__create_cells(f"H{self.numb_in_sec}", string["actualDepth"], font=font_,
-                                alignment=Alignment(vertical="center", horizontal="center"))
-            self.__create_cells(f"I{self.numb_in_sec}", f"=F{self.numb_in_sec}-C{self.numb_in_sec}", font=font_,
-                                alignment=Alignment(vertical="center", horizontal="center"))
-
-            if str(self.ws[f"J{self.numb_in_sec - 1}"].value).replace(".", "", 1).isdigit():
-                self.__create_cells(f"J{self.numb_in_sec}", f"=I{self.numb_in_sec}/24+J{self.numb_in_sec - 1}",
-                                    font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-            else:
-                self.__create_cells(f"J{self.numb_in_sec}", f"=I{self.numb_in_sec}/24", font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-
-            if "plannedNpt" in string.keys():
-                self.__create_cells(f"K{self.numb_in_sec}", string["plannedNpt"], font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-            self.__create_cells(f"L{self.numb_in_sec}", f"=E{self.numb_in_sec}-K{self.numb_in_sec}", font=font_,
-                                alignment=Alignment(vertical="center", horizontal="center"))
-
-            if str(self.ws[f"M{self.numb_in_sec - 1}"].value).replace(".", "", 1).isdigit():
-                self.__create_cells(f"M{self.numb_in_sec}", f"=K{self.numb_in_sec}/24+M{self.numb_in_sec - 1}",
-                                    font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-            else:
-                self.__create_cells(f"M{self.numb_in_sec}", f"=K{self.numb_in_sec}/24", font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-
-            if "nptComment" in string.keys():
-                self.__create_cells(f"N{self.numb_in_sec}", string["nptComment"], font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-
-            if "actualIlt" in string.keys():
-                self.__create_cells(f"O{self.numb_in_sec}", string["actualIlt"], font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-
-            if str(self.ws[f"P{self.numb_in_sec - 1}"].value).replace(".", "", 1).isdigit():
-                self.__create_cells(f"R{self.numb_in_sec}", f"=O{self.numb_in_sec}/24+P{self.numb_in_sec - 1}",
-                                    font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-            else:
-                self.__create_cells(f"P{self.numb_in_sec}", f"=O{self.numb_in_sec}/24", font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-
-            if str(self.ws[f"Q{self.numb_in_sec - 1}"].value).replace(".", "", 1).isdigit():
-                self.__create_cells(f"Q{self.numb_in_sec}",
-                                    f"=(F{self.numb_in_sec}-K{self.numb_in_sec}-O{self.numb_in_sec})/24+S{self.numb_in_sec - 1}",
-                                    font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-            else:
-                self.__create_cells(f"Q{self.numb_in_sec}",
-                                    f"=(F{self.numb_in_sec}-K{self.numb_in_sec}-O{self.numb_in_sec})/24", font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-
-            if "iltComment" in string.keys():
-                self.__create_cells(f"R{self.numb_in_sec}", string["iltComment"], font=font_,
-                                    alignment=Alignment(vertical="center", horizontal="center"))
-
+            for column, (value, style) in enumerate(zip(self.rows.render(elem), column_styles), 1):
+                cell = self.ws.cell(row=self.numb_in_sec, column=column, value=value)
+                cell._style = copy(style)
             self.numb_in_sec += 1
         return self.__file_save()
 
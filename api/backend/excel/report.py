@@ -0,0 +1,158 @@
+import asyncio
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import Executor
+from copy import copy
+from typing import BinaryIO, Callable, Iterable
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from excel.rows import RowTemplate, register_styles
+
+PATTERN_FILE = os.path.join(os.path.dirname(__file__), "pattern.xlsx")
+HEADER_ROWS = 8
+
+
+class Pattern:
+    """header of the pattern workbook, read once and replayed into write-only sheets"""
+
+    def __init__(self, file_name: str):
+        wb = openpyxl.load_workbook(file_name)
+        ws = wb.active
+        self.external_links = wb._external_links
+        self.rows = [
+            [(cell.value, self.__style_of(cell)) for cell in row]
+            for row in ws.iter_rows(max_row=HEADER_ROWS)
+        ]
+        self.merged_cells = [str(cell_range) for cell_range in ws.merged_cells.ranges]
+        self.column_widths = {key: dimension.width for key, dimension in ws.column_dimensions.items()}
+        self.row_heights = {key: dimension.height for key, dimension in ws.row_dimensions.items()
+                            if key <= HEADER_ROWS and dimension.height is not None}
+        self.data_validations = ws.data_validations.dataValidation
+
+    @staticmethod
+    def __style_of(cell) -> dict | None:
+        if not cell.has_style:
+            return None
+        return {
+            "font": copy(cell.font),
+            "fill": copy(cell.fill),
+            "border": copy(cell.border),
+            "alignment": copy(cell.alignment),
+            "number_format": cell.number_format,
+            "protection": copy(cell.protection),
+        }
+
+    def write_header(self, wb: openpyxl.Workbook, ws):
+        """must be called before the first row is appended"""
+        wb._external_links = self.external_links
+        for key, width in self.column_widths.items():
+            ws.column_dimensions[key].width = width
+        for key, height in self.row_heights.items():
+            ws.row_dimensions[key].height = height
+        for cell_range in self.merged_cells:
+            ws.merged_cells.add(cell_range)
+        for data_validation in self.data_validations:
+            ws.data_validations.append(copy(data_validation))
+        for row in self.rows:
+            cells = []
+            for value, style in row:
+                cell = WriteOnlyCell(ws, value)
+                if style is not None:
+                    for name, attribute in style.items():
+                        setattr(cell, name, attribute)
+                cells.append(cell)
+            ws.append(cells)
+
+
+_pattern: Pattern | None = None
+
+
+def get_pattern() -> Pattern:
+    global _pattern
+    if _pattern is None:
+        _pattern = Pattern(PATTERN_FILE)
+    return _pattern
+
+
+def write_event_report(out: BinaryIO, data: Iterable[dict], computed: bool = False):
+    """writes the pattern header followed by a row per operation into out"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    get_pattern().write_header(wb, ws)
+    # resolve the named styles once, then every cell just copies the resulting style array
+    column_styles = []
+    for style in register_styles(wb):
+        cell = WriteOnlyCell(ws)
+        cell.style = style
+        column_styles.append(cell._style)
+    template = RowTemplate(HEADER_ROWS + 1, computed)
+    for elem in data:
+        cells = []
+        for value, style in zip(template.render(elem), column_styles):
+            cell = WriteOnlyCell(ws, value)
+            cell._style = copy(style)
+            cells.append(cell)
+        ws.append(cells)
+    wb.save(out)
+
+
+def render_event_sheet(data: list[dict], computed: bool = False) -> tuple[bytes, bytes]:
+    """meant for a worker process: the sheet XML of an event report and the styles XML it refers to
+
+    Write-only sheets keep their strings inline, so the sheet XML is self-contained."""
+    buffer = io.BytesIO()
+    write_event_report(buffer, data, computed)
+    with zipfile.ZipFile(buffer) as package:
+        return package.read("xl/worksheets/sheet1.xml"), package.read("xl/styles.xml")
+
+
+def _sheet_title(title: str, used: set[str]) -> str:
+    title = re.sub(r"[\[\]:*?/\\]", " ", title).strip()[:31] or "Sheet"
+    unique, number = title, 1
+    while unique.lower() in used:
+        number += 1
+        suffix = f" ({number})"
+        unique = title[:31 - len(suffix)] + suffix
+    used.add(unique.lower())
+    return unique
+
+
+def merge_sheets(out: BinaryIO, titles: list[str], sheets: list[bytes], styles: bytes):
+    """packs rendered sheets into one workbook by swapping them into an empty one with the same sheets"""
+    wb = openpyxl.Workbook(write_only=True)
+    wb._external_links = get_pattern().external_links
+    used = set()
+    for title in titles:
+        wb.create_sheet(_sheet_title(title, used))
+    skeleton = io.BytesIO()
+    wb.save(skeleton)
+    parts = {f"xl/worksheets/sheet{i}.xml": sheet for i, sheet in enumerate(sheets, 1)}
+    # every sheet is rendered from the same header and row styles, so their style tables are identical
+    parts["xl/styles.xml"] = styles
+    with zipfile.ZipFile(skeleton) as source, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            target.writestr(item, parts.get(item.filename) or source.read(item))
+
+
+async def render_sheets(reports: list[tuple[str, list[dict]]], executor: Executor, computed: bool = False,
+                        progress: Callable[[int, int], None] | None = None) -> tuple[list[bytes], bytes]:
+    """renders a sheet per (title, rows) report on the executor, the sheets and styles to merge_sheets
+
+    progress, if given, is called with (sheets done, sheets in total + 1) as sheets get rendered, the
+    last step being the merge"""
+    loop = asyncio.get_running_loop()
+    futures = [loop.run_in_executor(executor, render_event_sheet, data, computed) for _, data in reports]
+    if progress is not None:
+        done = 0
+
+        def on_done(_):
+            nonlocal done
+            done += 1
+            progress(done, len(futures) + 1)
+
+        for future in futures:
+            future.add_done_callback(on_done)
+    rendered = await asyncio.gather(*futures)
+    return [sheet for sheet, _ in rendered], rendered[0][1]
@@ -0,0 +1,80 @@
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Font, NamedStyle
+
+DEFAULT_FONT = Font(size=10, bold=False)
+
+
+def register_styles(wb: Workbook, font: Font = DEFAULT_FONT) -> list[str]:
+    """adds the named styles of operation rows to the workbook once, returns the style name of each column"""
+    suffix = "" if font == DEFAULT_FONT else f" {hash(font):x}"
+    centered, name_column = f"Operation{suffix}", f"Operation name{suffix}"
+    for name, alignment in ((centered, Alignment(horizontal="center", vertical="center")),
+                            (name_column, Alignment(vertical="center"))):
+        if name not in wb.named_styles:
+            wb.add_named_style(NamedStyle(name=name, font=font, alignment=alignment))
+    return [centered, name_column] + [centered] * 16
+
+
+def _number(value) -> float:
+    return 0.0 if value is None or value == "" else float(value)
+
+
+class RowTemplate:
+    """renders the A:R cells of consecutive operation rows
+
+    Running totals are kept here rather than read back from the sheet. With computed=True the cumulative
+    and difference columns hold numbers (the same curves utils.get_dots returns) instead of formulas,
+    for viewers that do not recalculate."""
+
+    def __init__(self, first_row: int, computed: bool = False):
+        self.first_row = first_row
+        self.row = first_row
+        self.computed = computed
+        self.planned_days = 0.0
+        self.actual_days = 0.0
+        self.behind_days = 0.0
+        self.npt_days = 0.0
+        self.ilt_days = 0.0
+        self.clean_days = 0.0
+
+    def render(self, elem: dict) -> list:
+        parameters = elem["parameters"]
+        planned_time = parameters["plannedTime"]
+        planned_depth = parameters["plannedDepth"]
+        actual_time = parameters["actualTime"]
+        actual_depth = parameters["actualDepth"]
+        planned_npt = parameters.get("plannedNpt")
+        actual_ilt = parameters.get("actualIlt")
+        n = self.row
+        self.row += 1
+        if self.computed:
+            planned, actual = _number(planned_time), _number(actual_time)
+            npt, ilt = _number(planned_npt), _number(actual_ilt)
+            self.planned_days += planned / 24
+            self.actual_days += actual / 24
+            self.behind_days += (actual - planned) / 24
+            self.npt_days += npt / 24
+            self.ilt_days += ilt / 24
+            self.clean_days += (actual - npt - ilt) / 24
+            behind = actual - planned
+            without_npt = _number(planned_depth) - npt
+            cumulative = (self.planned_days, self.actual_days, self.behind_days,
+                          self.npt_days, self.ilt_days, self.clean_days)
+        else:
+            behind = f"=F{n}-C{n}"
+            without_npt = f"=E{n}-K{n}"
+            expressions = (f"C{n}/24", f"F{n}/24", f"I{n}/24", f"K{n}/24", f"O{n}/24", f"(F{n}-K{n}-O{n})/24")
+            if n == self.first_row:
+                cumulative = tuple(f"={expression}" for expression in expressions)
+            else:
+                p = n - 1
+                cumulative = tuple(f"={expression}+{column}{p}"
+                                   for expression, column in zip(expressions, "DGJMPQ"))
+        return [
+            elem["id"], elem["name"],
+            planned_time, cumulative[0], planned_depth,
+            actual_time, cumulative[1], actual_depth,
+            behind, cumulative[2],
+            planned_npt, without_npt, cumulative[3], parameters.get("nptComment"),
+            actual_ilt, cumulative[4], cumulative[5], parameters.get("iltComment"),
+        ]
@@ -0,0 +1,139 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import AsyncIterator, BinaryIO, Callable
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+import config
+import utils
+from excel.report import write_event_report, render_sheets, merge_sheets
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# what the writer thread hands over at once, and how many of those may wait for a slow client
+CHUNK_SIZE = 64 * 1024
+CHUNKS_AHEAD = 4
+
+executor = ProcessPoolExecutor(max_workers=config.EXPORT_PROCESSES)
+
+Progress = Callable[[int, int], None]
+# writes a workbook into a file, on a thread
+Writer = Callable[[BinaryIO], None]
+
+
+class ReaderGone(Exception):
+    pass
+
+
+class _Pipe:
+    """a write-only, unseekable file (which zipfile supports) whose contents an async consumer reads as chunks;
+    write blocks while CHUNKS_AHEAD chunks are waiting, so the workbook is never held in memory as a whole"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.chunks: asyncio.Queue[bytes | None] = asyncio.Queue(CHUNKS_AHEAD)
+        self.pending = bytearray()
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.pending += data
+        if len(self.pending) >= CHUNK_SIZE:
+            self.__send(bytes(self.pending))
+            self.pending.clear()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        """called by the writer thread once it is done, successfully or not"""
+        if self.pending:
+            self.__send(bytes(self.pending))
+        self.__send(None)
+
+    def abort(self):
+        """called by the consumer when it stops reading, so that the writer thread stops writing"""
+        self.closed = True
+        while not self.chunks.empty():
+            self.chunks.get_nowait()
+
+    def __send(self, chunk: bytes | None):
+        if self.closed:
+            raise ReaderGone
+        asyncio.run_coroutine_threadsafe(self.chunks.put(chunk), self.loop).result()
+
+
+async def stream(writer: Writer) -> AsyncIterator[bytes]:
+    """runs the writer on a thread and yields what it writes as it goes"""
+    pipe = _Pipe(asyncio.get_running_loop())
+
+    def write():
+        try:
+            writer(pipe)
+        finally:
+            if not pipe.closed:
+                pipe.finish()
+
+    task = asyncio.ensure_future(run_in_threadpool(write))
+    # nobody awaits a writer stopped by abort, this retrieves its ReaderGone
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    try:
+        while (chunk := await pipe.chunks.get()) is not None:
+            yield chunk
+        # a writer that failed ends the stream early, which truncates the response instead of completing it
+        await task
+    finally:
+        pipe.abort()
+
+
+async def to_bytes(writer: Writer | None, progress: Progress | None = None) -> bytes | None:
+    """the whole workbook at once, for export jobs that store it"""
+    if writer is None:
+        return None
+    buffer = io.BytesIO()
+    await run_in_threadpool(writer, buffer)
+    if progress is not None:
+        progress(1, 1)
+    return buffer.getvalue()
+
+
+async def event_writer(db: AsyncSession, event_id: int, computed: bool = False) -> Writer | None:
+    data = await utils.get_data_of_event_for_excel(db, event_id)
+    if data is None:
+        return None
+    # every export writes into its own file, so concurrent exports never share one
+    return partial(write_event_report, data=data, computed=computed)
+
+
+async def sheets_writer(reports: list[tuple[str, list[dict]]], computed: bool = False,
+                        progress: Progress | None = None) -> Writer | None:
+    """renders the sheets on the executor, what is left to the writer is packing them"""
+    if not reports:
+        return None
+    sheets, styles = await render_sheets(reports, executor, computed, progress)
+    return partial(merge_sheets, titles=[title for title, _ in reports], sheets=sheets, styles=styles)
+
+
+async def bush_writer(db: AsyncSession, bush_id: int, computed: bool = False,
+                      progress: Progress | None = None) -> Writer | None:
+    return await sheets_writer(await utils.get_data_of_bush_for_excel(db, bush_id), computed, progress)
+
+
+async def field_writer(db: AsyncSession, field_name: str, computed: bool = False,
+                       progress: Progress | None = None) -> Writer | None:
+    return await sheets_writer(await utils.get_data_of_field_for_excel(db, field_name), computed, progress)
+
+
+async def export_event(db: AsyncSession, event_id: int, computed: bool = False,
+                       progress: Progress | None = None) -> bytes | None:
+    return await to_bytes(await event_writer(db, event_id, computed), progress)
+
+
+async def export_bush(db: AsyncSession, bush_id: int, computed: bool = False,
+                      progress: Progress | None = None) -> bytes | None:
+    return await to_bytes(await bush_writer(db, bush_id, computed, progress), progress)
+
+
+async def export_field(db: AsyncSession, field_name: str, computed: bool = False,
+                       progress: Progress | None = None) -> bytes | None:
+    return await to_bytes(await field_writer(db, field_name, computed, progress), progress)
@@ -0,0 +1,183 @@
+import asyncio
+import time
+import uuid
+from sqlalchemy import select, update, delete, func, or_
+import config
+import exports
+import models
+import schemas
+from models import ExportJob
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def file_name(job: ExportJob) -> str:
+    return f"{job.kind}_{job.target}.xlsx"
+
+
+class JobQueue:
+    """export queue in the ExportJobs table, so a job submitted to one worker can be polled, run and
+    downloaded by any other: every process runs a fixed number of worker tasks that claim queued jobs,
+    at most max_queued jobs wait, finished jobs are kept while their results fit into max_bytes and there
+    are at most max_jobs of them"""
+
+    def __init__(self, workers: int, max_bytes: int, max_jobs: int, max_queued: int):
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.max_jobs = max_jobs
+        self.max_queued = max_queued
+        self.tasks: list[asyncio.Task] = []
+        # set by submit, so the workers of this process don't wait for the next poll
+        self.wakeup: asyncio.Event | None = None
+        # job id -> progress of the jobs this process runs, written out with every heartbeat
+        self.running: dict[str, float] = {}
+
+    async def start(self):
+        self.wakeup = asyncio.Event()
+        self.tasks = [asyncio.create_task(self.__work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        interrupted = list(self.running)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if interrupted:
+            # hand the jobs to the other workers right away instead of after EXPORT_JOB_STALE_SECONDS
+            async with models.async_session() as session:
+                await session.execute(update(ExportJob).where(ExportJob.id.in_(interrupted), ExportJob.status == RUNNING)
+                                      .values(status=QUEUED, progress=0.0))
+                await session.commit()
+
+    async def submit(self, request: schemas.ExportJobCreate) -> ExportJob:
+        """identical requests share a job while it is queued or running;
+        raises asyncio.QueueFull when max_queued jobs are already waiting"""
+        # the writer transaction holds the database lock, so no other worker submits in between
+        async with models.async_session() as session:
+            job = (await session.execute(select(ExportJob).where(
+                ExportJob.kind == request.kind, ExportJob.target == request.target,
+                ExportJob.computed == request.computed, ExportJob.status.in_((QUEUED, RUNNING))
+            ).limit(1))).scalar_one_or_none()
+            if job is not None:
+                return job
+            queued = (await session.execute(
+                select(func.count()).select_from(ExportJob).where(ExportJob.status == QUEUED))).scalar_one()
+            if queued >= self.max_queued:
+                raise asyncio.QueueFull
+            now = time.time()
+            job = ExportJob(id=uuid.uuid4().hex, kind=request.kind, target=request.target, computed=request.computed,
+                            status=QUEUED, progress=0.0, size=0, created=now, updated=now)
+            session.add(job)
+            await session.commit()
+        if self.wakeup is not None:
+            self.wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> ExportJob | None:
+        async with models.read_session() as session:
+            return await session.get(ExportJob, job_id)
+
+    async def get_result(self, job_id: str) -> bytes | None:
+        async with models.read_session() as session:
+            return (await session.execute(
+                select(ExportJob.result).where(ExportJob.id == job_id, ExportJob.status == DONE))).scalar_one_or_none()
+
+    async def __work(self):
+        while True:
+            job = await self.__claim()
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), config.EXPORT_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.running[job.id] = 0.0
+            heartbeat = asyncio.create_task(self.__heartbeat(job.id))
+            try:
+                await self.__run(job)
+            finally:
+                heartbeat.cancel()
+                del self.running[job.id]
+
+    @staticmethod
+    def __claimable(now: float):
+        return or_(ExportJob.status == QUEUED,
+                   (ExportJob.status == RUNNING) & (ExportJob.updated < now - config.EXPORT_JOB_STALE_SECONDS))
+
+    async def __claim(self) -> ExportJob | None:
+        """the oldest queued job, or one whose worker stopped sending heartbeats"""
+        now = time.time()
+        # a look on a reader first, so idle workers don't take the write lock every poll
+        async with models.read_session() as session:
+            if (await session.execute(select(ExportJob.id).where(self.__claimable(now)).limit(1))).first() is None:
+                return None
+        async with models.async_session() as session:
+            job = (await session.execute(
+                select(ExportJob).where(self.__claimable(now)).order_by(ExportJob.created).limit(1)
+            )).scalar_one_or_none()
+            if job is not None:
+                job.status = RUNNING
+                job.progress = 0.0
+                job.updated = now
+                await session.commit()
+            return job
+
+    async def __heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(config.EXPORT_JOB_POLL_SECONDS)
+            async with models.async_session() as session:
+                await session.execute(update(ExportJob).where(ExportJob.id == job_id, ExportJob.status == RUNNING)
+                                      .values(progress=self.running[job_id], updated=time.time()))
+                await session.commit()
+
+    async def __run(self, job: ExportJob):
+        def set_progress(done: int, total: int):
+            self.running[job.id] = done / total
+
+        try:
+            async with models.read_session() as session:
+                if job.kind == "event":
+                    res = await exports.export_event(session, int(job.target), job.computed, set_progress)
+                elif job.kind == "bush":
+                    res = await exports.export_bush(session, int(job.target), job.computed, set_progress)
+                else:
+                    res = await exports.export_field(session, job.target, job.computed, set_progress)
+            if res is None:
+                values = {"status": FAILED, "error": "Нечего выгружать"}
+            elif len(res) > self.max_bytes:
+                # it would be evicted right away
+                values = {"status": FAILED, "error": "Файл выгрузки превышает допустимый размер"}
+            else:
+                values = {"status": DONE, "progress": 1.0, "result": res, "size": len(res)}
+        except Exception as e:
+            values = {"status": FAILED, "error": repr(e)}
+        async with models.async_session() as session:
+            await session.execute(update(ExportJob).where(ExportJob.id == job.id)
+                                  .values(finished=time.time(), updated=time.time(), **values))
+            await self.__evict(session)
+            await session.commit()
+
+    async def __evict(self, session):
+        """drops the oldest finished jobs until both limits hold"""
+        count, stored_bytes = (await session.execute(
+            select(func.count(), func.coalesce(func.sum(ExportJob.size), 0)))).one()
+        if stored_bytes <= self.max_bytes and count <= self.max_jobs:
+            return
+        stale = []
+        for job_id, size in await session.execute(
+                select(ExportJob.id, ExportJob.size).where(ExportJob.status.in_((DONE, FAILED)))
+                .order_by(ExportJob.finished)):
+            if stored_bytes <= self.max_bytes and count <= self.max_jobs:
+                break
+            stale.append(job_id)
+            stored_bytes -= size
+            count -= 1
+        await session.execute(delete(ExportJob).where(ExportJob.id.in_(stale)))
+
+
+queue = JobQueue(config.EXPORT_JOB_WORKERS, config.EXPORT_JOB_RESULTS_MAX_BYTES, config.EXPORT_JOB_MAX_JOBS,
+                 config.EXPORT_JOB_MAX_QUEUED)
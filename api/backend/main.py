@@ -1,40 +1,63 @@
+import asyncio
+import gzip
 import os
 import sys
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, UploadFile, BackgroundTasks, Header, Request
+import batching
+import cache
+import config
 import crud
+import exports
+import jobs
 import models
 import schemas
 import utils
-from security import decode_jwt, JWTBearer, verify_password, sign_jwt
+from excel.importer import read_operations, WorkbookError
+import security
+from security import decode_jwt, JWTBearer, verify_password, sign_jwt, revoke_jwt, get_cached_user, cache_user
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+from starlette.concurrency import iterate_in_threadpool
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
-from typing import TypeVar, Generic, Dict
+from typing import TypeVar, Generic, Dict, AsyncIterator, Awaitable, Callable
 
 
 async def get_user_from_jwt(session, token: str) -> models.User:
-    data = decode_jwt(token)
+    data = await decode_jwt(token)
     if data is None:
         raise HTTPException(status_code=400, detail="Invalid token")
-    user = await crud.get_user_by_username(session, data['user_id'])
+    user = get_cached_user(data['user_id'])
     if user is None:
-        raise HTTPException(status_code=400, detail="User not found")
+        version = security.auth_version
+        user = await crud.get_user_by_username(session, data['user_id'])
+        if user is None:
+            raise HTTPException(status_code=400, detail="User not found")
+        cache_user(user, version)
     return user
 
 
-async def get_session() -> AsyncSession:
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """session of the writer connection, for routes that change something"""
     async with models.async_session() as session:
-        async with session.begin():
-            return session
+        yield session
 
 
-async def admin_required(token: str = Depends(JWTBearer()), session: AsyncSession = Depends(get_session)):
+async def get_read_session() -> AsyncIterator[AsyncSession]:
+    async with models.read_session() as session:
+        yield session
+
+
+async def admin_required(token: str = Depends(JWTBearer()), session: AsyncSession = Depends(get_read_session)):
     user = await get_user_from_jwt(session, token)
     if not user.is_admin:
         raise HTTPException(status_code=403, detail="Admin required")
 
 
-async def get_current_user(session: AsyncSession = Depends(get_session), token: str = Depends(JWTBearer())):
+async def get_current_user(session: AsyncSession = Depends(get_read_session), token: str = Depends(JWTBearer())):
     return await get_user_from_jwt(session, token)
 
 
@@ -52,6 +75,62 @@ def ok(obj):
     }
 
 
+def page(items, limit: int, key):
+    return {
+        "items": items,
+        "next_cursor": key(items[-1]) if len(items) == limit else None
+    }
+
+
+def if_match_version(if_match: str | None = Header(None)) -> int | None:
+    """the version an If-Match header asks for, None when any version will do"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный заголовок If-Match")
+
+
+def versioned(res: tuple[int, dict], response: Response) -> dict:
+    version, parameters = res
+    response.headers["ETag"] = f'"{version}"'
+    return {"version": version, "parameters": parameters}
+
+
+def has_version(request: Request, version: str) -> bool:
+    """If-None-Match lists the version, as either the plain or the gzipped representation"""
+    tags = request.headers.get("If-None-Match")
+    if tags is None:
+        return False
+    return any(tag.strip().removeprefix("W/").strip('"').removesuffix("-gzip") == version for tag in tags.split(","))
+
+
+async def cached_json(request: Request, key: str, build: Callable[[], Awaitable[bytes | None]]) -> Response | None:
+    """serves the JSON cached under key with its version as a strong ETag: 304 if the client has that version,
+    else the gzipped body, built and cached on a miss. None if build found nothing, which isn't cached"""
+    version = await cache.version(key)
+    gzipped = "gzip" in request.headers.get("Accept-Encoding", "")
+    headers = {"ETag": f'"{version}-gzip"' if gzipped else f'"{version}"', "Vary": "Accept-Encoding"}
+    if has_version(request, version):
+        return Response(status_code=304, headers=headers)
+    body = await cache.get(key, version)
+    if body is None:
+        body = await build()
+        if body is None:
+            return None
+        body = await cache.put(key, version, body)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+PAGE_LIMIT = Query(50, ge=1, le=500)
+PAGE_DEPTH = Query(0, ge=0, le=4)
+
+
 T = TypeVar('T')
 class ErrorModel(Generic[T], BaseModel):
     ok: bool
@@ -71,21 +150,201 @@ app.add_middleware(
 )
 
 
+class SkipCompressedResponder(GZipResponder):
+    """passes the xlsx exports through as they are, they are zip archives already"""
+
+    async def send_with_gzip(self, message: Message):
+        if message["type"] == "http.response.start":
+            media_type = Headers(raw=message["headers"]).get("content-type", "").split(";")[0]
+            if media_type == exports.XLSX_MEDIA_TYPE:
+                self.initial_message = message
+                self.content_encoding_set = True
+                return
+        await super().send_with_gzip(message)
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = SkipCompressedResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(JSONGZipMiddleware, minimum_size=1000)
+
+
+def xlsx_response(content: bytes | AsyncIterator[bytes], file_name: str) -> Response:
+    """a stored result is sent as it is, a workbook being written is streamed as it gets written"""
+    headers = {"Content-Disposition": f'attachment; filename="{file_name}"'}
+    if isinstance(content, bytes):
+        return Response(content, media_type=exports.XLSX_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(content, media_type=exports.XLSX_MEDIA_TYPE, headers=headers)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await jobs.queue.stop()
+    await batching.writes.stop()
+    exports.executor.shutdown(cancel_futures=True)
+
+
 @app.on_event("startup")
 async def startup():
     await models.init_engine()
-    session = await get_session()
-    await crud.create_user(session, models.User(username='admin', password='admin', is_admin=True))
+    if config.WRITE_BATCHING:
+        await batching.writes.start()
+    async with models.async_session() as session:
+        # the lookup takes the write lock, so workers starting at once don't both create the admin
+        if await crud.get_user_by_username(session, 'admin') is None:
+            await crud.create_user(session, models.User(username='admin', password='admin', is_admin=True))
+    await jobs.queue.start()
 
 
 @app.get("/get_fields", response_model=list[schemas.Field], dependencies=[Depends(JWTBearer())])
-async def get_fields(session: AsyncSession = Depends(get_session)):
-    return await crud.get_fields(session)
+async def get_fields(request: Request, session: AsyncSession = Depends(get_read_session)):
+    async def build():
+        if config.FAST_JSON:
+            return cache.encode_records(await utils.get_fields_records(session))
+        res = await crud.get_fields(session)
+        return cache.encode([schemas.Field.from_orm(field) for field in res])
+
+    return await cached_json(request, cache.FIELDS, build)
+
+
+@app.get("/export_fields.ndjson", response_class=StreamingResponse, dependencies=[Depends(JWTBearer())])
+async def export_fields(session: AsyncSession = Depends(get_read_session)):
+    return StreamingResponse(utils.stream_fields_ndjson(session), media_type="application/x-ndjson")
+
+
+@app.get("/export_event/{event_id}.xlsx", response_class=StreamingResponse, dependencies=[Depends(JWTBearer())])
+async def export_event(event_id: int, computed: bool = False, session: AsyncSession = Depends(get_read_session)):
+    res = await exports.event_writer(session, event_id, computed)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Не найдено мероприятие с указанным ID")
+    return xlsx_response(exports.stream(res), f"event_{event_id}.xlsx")
+
+
+@app.get("/export_bush/{bush_id}.xlsx", response_class=StreamingResponse, dependencies=[Depends(JWTBearer())])
+async def export_bush(bush_id: int, computed: bool = False, session: AsyncSession = Depends(get_read_session)):
+    res = await exports.bush_writer(session, bush_id, computed)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Не найдено мероприятий куста с указанным ID")
+    return xlsx_response(exports.stream(res), f"bush_{bush_id}.xlsx")
+
+
+@app.get("/export_field/{field_name}.xlsx", response_class=StreamingResponse, dependencies=[Depends(JWTBearer())])
+async def export_field(field_name: str, computed: bool = False, session: AsyncSession = Depends(get_read_session)):
+    res = await exports.field_writer(session, field_name, computed)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Не найдено мероприятий месторождения с указанным именем")
+    return xlsx_response(exports.stream(res), f"field_{field_name}.xlsx")
+
+
+@app.post("/jobs/export", response_model=schemas.ExportJob, dependencies=[Depends(JWTBearer())])
+async def submit_export_job(request: schemas.ExportJobCreate):
+    try:
+        return await jobs.queue.submit(request)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Очередь выгрузок переполнена, повторите позже")
+
+
+async def get_job(job_id: str) -> models.ExportJob:
+    job = await jobs.queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+
+@app.get("/jobs/{job_id}", response_model=schemas.ExportJob, dependencies=[Depends(JWTBearer())])
+async def get_export_job(job: models.ExportJob = Depends(get_job)):
+    return job
+
+
+@app.get("/jobs/{job_id}/result", response_class=StreamingResponse, dependencies=[Depends(JWTBearer())])
+async def get_export_job_result(job: models.ExportJob = Depends(get_job)):
+    result = await jobs.queue.get_result(job.id)
+    if result is None:
+        raise HTTPException(status_code=409, detail=job.error or "Задача ещё не выполнена")
+    return xlsx_response(result, jobs.file_name(job))
+
+
+@app.get("/fields", response_model=schemas.FieldPage, dependencies=[Depends(JWTBearer())])
+async def get_fields_page(cursor: str | None = None, limit: int = PAGE_LIMIT, depth: int = PAGE_DEPTH,
+                          session: AsyncSession = Depends(get_read_session)):
+    res = await crud.get_fields_page(session, cursor, limit, depth)
+    return page(res, limit, lambda field: field.name)
+
+
+@app.get("/fields/{field_name}/bushes", response_model=schemas.BushPage, dependencies=[Depends(JWTBearer())])
+async def get_bushes_page(field_name: str, cursor: int | None = None, limit: int = PAGE_LIMIT,
+                          depth: int = Query(0, ge=0, le=3), session: AsyncSession = Depends(get_read_session)):
+    res = await crud.get_bushes_page(session, field_name, cursor, limit, depth)
+    return page(res, limit, lambda bush: bush.id)
+
+
+@app.get("/bushes/{bush_id}/wells", response_model=schemas.WellPage, dependencies=[Depends(JWTBearer())])
+async def get_wells_page(bush_id: int, cursor: int | None = None, limit: int = PAGE_LIMIT,
+                         depth: int = Query(0, ge=0, le=2), session: AsyncSession = Depends(get_read_session)):
+    res = await crud.get_wells_page(session, bush_id, cursor, limit, depth)
+    return page(res, limit, lambda well: well.id)
+
+
+@app.get("/wells/{well_id}/events", response_model=schemas.EventPage, dependencies=[Depends(JWTBearer())])
+async def get_events_page(well_id: int, cursor: int | None = None, limit: int = PAGE_LIMIT,
+                          depth: int = Query(0, ge=0, le=1), session: AsyncSession = Depends(get_read_session)):
+    res = await crud.get_events_page(session, well_id, cursor, limit, depth)
+    return page(res, limit, lambda event: event.id)
+
+
+@app.get("/events/{event_id}/operations", response_model=schemas.OperationPage,
+         dependencies=[Depends(JWTBearer())])
+async def get_operations_page(event_id: int, cursor: int | None = None, limit: int = PAGE_LIMIT,
+                              session: AsyncSession = Depends(get_read_session)):
+    res = await crud.get_operations_page(session, event_id, cursor, limit)
+    return page(res, limit, lambda operation: operation.order)
+
+
+@app.post("/operations/search", response_model=schemas.OperationSearchPage, dependencies=[Depends(JWTBearer())])
+async def search_operations(search: schemas.OperationSearch, cursor: str | None = None, limit: int = PAGE_LIMIT,
+                            session: AsyncSession = Depends(get_read_session)):
+    try:
+        res = await crud.search_operations(session, search, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный курсор")
+    return {
+        "items": [operation for operation, _ in res],
+        "next_cursor": crud.search_cursor(*res[-1]) if len(res) == limit else None
+    }
+
+
+@app.post("/wells/search", response_model=schemas.WellPage, dependencies=[Depends(JWTBearer())])
+async def search_wells(search: schemas.WellSearch, cursor: int | None = None, limit: int = PAGE_LIMIT,
+                       session: AsyncSession = Depends(get_read_session)):
+    res = await crud.search_wells(session, search, cursor, limit)
+    return page(res, limit, lambda well: well.id)
 
 
 @app.get("/get_dots/{event_id}", response_model=schemas.Dots, dependencies=[Depends(JWTBearer())])
-async def get_dots(event_id, session: AsyncSession = Depends(get_session)):
-    return await utils.get_dots(session, event_id)
+async def get_dots(event_id: int, request: Request, max_points: int | None = Query(None, ge=3),
+                   session: AsyncSession = Depends(get_read_session)):
+    if max_points is not None:
+        return await utils.get_dots(session, event_id, max_points)
+
+    async def build():
+        res = await utils.get_dots(session, event_id)
+        return None if res is None else cache.encode(res)
+
+    return await cached_json(request, cache.dots_key(event_id), build)
+
+
+@app.get("/dots", response_model=list[schemas.EventDots], dependencies=[Depends(JWTBearer())])
+async def get_dots_of_scope(well_id: int | None = None, bush_id: int | None = None, field_name: str | None = None,
+                            max_points: int | None = Query(None, ge=3), session: AsyncSession = Depends(get_read_session)):
+    if (well_id, bush_id, field_name).count(None) != 2:
+        raise HTTPException(status_code=400, detail="Укажите ровно одно из well_id, bush_id, field_name")
+    return await utils.get_dots_of_scope(session, well_id, bush_id, field_name, max_points)
 
 
 @app.post("/create_field", response_model=schemas.FieldBase, dependencies=[Depends(admin_required)])
@@ -119,11 +378,18 @@ async def create_event(event: schemas.EventCreate, session: AsyncSession = Depen
 
 
 @app.get("/get_event_by_id/{event_id}", response_model=ErrorModel[schemas.Event], dependencies=[Depends(JWTBearer())])
-async def get_event_by_id(event_id: int, session: AsyncSession = Depends(get_session)):
-    res = await crud.get_event_by_id(session, event_id)
+async def get_event_by_id(event_id: int, request: Request, session: AsyncSession = Depends(get_read_session)):
+    async def build():
+        if config.FAST_JSON:
+            res = await utils.get_event_record(session, event_id)
+            return None if res is None else cache.encode_records(ok(res))
+        res = await crud.get_event_by_id(session, event_id)
+        return None if res is None else cache.encode(ok(schemas.Event.from_orm(res)))
+
+    res = await cached_json(request, cache.event_key(event_id), build)
     if res is None:
         return error("Не найдено мероприятие с указанным ID")
-    return ok(schemas.Event.from_orm(res))
+    return res
 
 
 @app.post("/create_operation", response_model=ErrorModel[int], dependencies=[Depends(JWTBearer())])
@@ -134,17 +400,144 @@ async def create_operation(operation: schemas.OperationCreate, session: AsyncSes
     return ok(res.id)
 
 
+@app.post("/bulk/create_wells", response_model=ErrorModel[list[int]], dependencies=[Depends(JWTBearer())])
+async def bulk_create_wells(wells: list[schemas.WellCreate], session: AsyncSession = Depends(get_session)):
+    res = await crud.create_wells(session, wells)
+    if res is None:
+        return error("Не найден куст с указанным ID")
+    return ok(res)
+
+
+@app.post("/bulk/create_events", response_model=ErrorModel[list[int]], dependencies=[Depends(JWTBearer())])
+async def bulk_create_events(events: list[schemas.EventCreate], session: AsyncSession = Depends(get_session)):
+    res = await crud.create_events(session, events)
+    if res is None:
+        return error("Не найдена скважина с указанным ID")
+    return ok(res)
+
+
+@app.post("/bulk/create_operations", response_model=ErrorModel[list[int]], dependencies=[Depends(JWTBearer())])
+async def bulk_create_operations(operations: list[schemas.OperationCreate],
+                                 session: AsyncSession = Depends(get_session)):
+    res = await crud.create_operations(session, operations)
+    if res is None:
+        return error("Не существует такого мероприятия")
+    return ok(res)
+
+
+@app.post("/import_operations/{event_id}", response_model=ErrorModel[int], dependencies=[Depends(JWTBearer())])
+async def import_operations(event_id: int, file: UploadFile, session: AsyncSession = Depends(get_session)):
+    try:
+        res = await crud.import_operations(session, event_id, iterate_in_threadpool(read_operations(file.file)))
+    except WorkbookError as e:
+        return error(str(e))
+    if res is None:
+        return error("Не существует такого мероприятия")
+    return ok(res)
+
+
+@app.post("/render_names", response_model=ErrorModel[list[str]], dependencies=[Depends(JWTBearer())])
+async def render_names(request: schemas.RenderNames, session: AsyncSession = Depends(get_read_session)):
+    res = await utils.replace_patterns_in_names(session, request.well_id, request.names)
+    if res is None:
+        return error("Не найдена скважина с указанным ID")
+    return ok(res)
+
+
+@app.post("/update_operation_parameters/{operation_id}", response_model=ErrorModel[schemas.Operation],
+          dependencies=[Depends(JWTBearer())])
+async def update_operation_parameters(operation_id: int, parameters: dict, session: AsyncSession = Depends(get_session)):
+    if config.WRITE_BATCHING:
+        res = await batching.writes.submit(crud.stage_parameters_of_operation, operation_id, parameters)
+    else:
+        res = await crud.update_parameters_of_operation(session, operation_id, parameters)
+    if res is None:
+        return error("Не найдена операция с указанным ID")
+    return ok(schemas.Operation.from_orm(res))
+
+
+@app.post("/update_well_parameters/{well_id}", response_model=ErrorModel[schemas.WellNode],
+          dependencies=[Depends(JWTBearer())])
+async def update_well_parameters(well_id: int, parameters: dict, session: AsyncSession = Depends(get_session)):
+    if config.WRITE_BATCHING:
+        res = await batching.writes.submit(crud.stage_parameters_of_well, well_id, parameters)
+    else:
+        res = await crud.update_parameters_of_well(session, well_id, parameters)
+    if res is None:
+        return error("Не найдена скважина с указанным ID")
+    return ok(schemas.WellNode.from_orm(res))
+
+
+@app.patch("/operations/{operation_id}/parameters", response_model=schemas.VersionedParameters,
+           dependencies=[Depends(JWTBearer())])
+async def patch_operation_parameters(operation_id: int, patch: dict, response: Response,
+                                     version: int | None = Depends(if_match_version),
+                                     session: AsyncSession = Depends(get_session)):
+    try:
+        res = await crud.patch_parameters_of_operation(session, operation_id, patch, version)
+    except crud.VersionConflict:
+        raise HTTPException(status_code=409, detail="Параметры операции уже изменены, обновите данные")
+    if res is None:
+        raise HTTPException(status_code=404, detail="Не найдена операция с указанным ID")
+    return versioned(res, response)
+
+
+@app.patch("/wells/{well_id}/parameters", response_model=schemas.VersionedParameters,
+           dependencies=[Depends(JWTBearer())])
+async def patch_well_parameters(well_id: int, patch: dict, response: Response,
+                                version: int | None = Depends(if_match_version),
+                                session: AsyncSession = Depends(get_session)):
+    try:
+        res = await crud.patch_parameters_of_well(session, well_id, patch, version)
+    except crud.VersionConflict:
+        raise HTTPException(status_code=409, detail="Параметры скважины уже изменены, обновите данные")
+    if res is None:
+        raise HTTPException(status_code=404, detail="Не найдена скважина с указанным ID")
+    return versioned(res, response)
+
+
+@app.get("/metrics/write_batches", response_model=schemas.WriteBatchMetrics, dependencies=[Depends(admin_required)])
+async def get_write_batch_metrics():
+    return batching.writes.metrics.as_dict()
+
+
 @app.post("/create_example_operation", response_model=schemas.ExampleOperation, dependencies=[Depends(JWTBearer())])
 async def create_example_operation(operation: schemas.ExampleOperationCreate,
                                    session: AsyncSession = Depends(get_session)):
     return schemas.ExampleOperation.from_orm(await crud.create_example_operation(session, operation))
 
 
+@app.get("/search_operation_names", response_model=list[schemas.NameSuggestion], dependencies=[Depends(JWTBearer())])
+async def search_operation_names(q: str, limit: int = Query(10, ge=1, le=50),
+                                 session: AsyncSession = Depends(get_read_session)):
+    res = await crud.search_names(session, q, limit)
+    return [schemas.NameSuggestion(name=name, example=example) for name, example in res]
+
+
 @app.post("/delete_operation/{operation_id}", dependencies=[Depends(JWTBearer())], response_model=bool)
 async def delete_operation(operation_id: int, session=Depends(get_session)):
     return (await crud.delete_operation(session, operation_id)) is not None
 
 
+async def rebalance_events(event_ids: set[int]):
+    async with models.async_session() as session:
+        for event_id in event_ids:
+            await crud.rebalance_event_order(session, event_id)
+
+
+@app.post("/move_operation/{operation_id}", response_model=ErrorModel[schemas.Operation],
+          dependencies=[Depends(JWTBearer())])
+async def move_operation(operation_id: int, background_tasks: BackgroundTasks, before_id: int | None = None,
+                         after_id: int | None = None, session: AsyncSession = Depends(get_session)):
+    res = await crud.move_operation(session, operation_id, before_id, after_id)
+    if isinstance(res, str):
+        return error(res)
+    crowded = crud.pop_crowded_events(session)
+    if crowded:
+        background_tasks.add_task(rebalance_events, crowded)
+    return ok(schemas.Operation.from_orm(res))
+
+
 @app.post("/update_operation_order", response_model=ErrorModel[schemas.Event], dependencies=[Depends(JWTBearer())])
 async def update_operation_order(event_id: int, new_order: list[int], session=Depends(get_session)):
     res = await crud.update_operation_order_for_event(session, event_id, new_order)
@@ -155,8 +548,8 @@ async def update_operation_order(event_id: int, new_order: list[int], session=De
 
 
 @app.post("/add_user", response_model=ErrorModel[str], dependencies=[Depends(JWTBearer()), Depends(admin_required)])
-async def register(user: schemas.User, db=Depends(get_session)):
-    db_user = await crud.get_user_by_username(db, user.username)
+async def register(user: schemas.User, db=Depends(get_session), reader=Depends(get_read_session)):
+    db_user = await crud.get_user_by_username(reader, user.username)
     if db_user:
         return error("Пользователь уже зарегистрирован")
     await crud.create_user(db=db, user=user)
@@ -164,9 +557,18 @@ async def register(user: schemas.User, db=Depends(get_session)):
 
 
 @app.post("/login", response_model=ErrorModel[str])
-async def login(user: schemas.UserLoginSchema, session=Depends(get_session)):
+async def login(user: schemas.UserLoginSchema, session=Depends(get_read_session), writer=Depends(get_session)):
     res = await crud.get_user_by_username(session, user.login)
     if res:
-        if verify_password(user.password, res.password):
+        is_valid, new_hash = await verify_password(user.password, res.password)
+        if is_valid:
+            if new_hash is not None:
+                await crud.update_password_hash(writer, res.username, new_hash)
             return ok(sign_jwt(res.username)['access_token'])
     return error("Неверные данные входа")
+
+
+@app.post("/logout", response_model=ErrorModel[str])
+async def logout(token: str = Depends(JWTBearer())):
+    await revoke_jwt(token)
+    return ok("")
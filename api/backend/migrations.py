@@ -0,0 +1,222 @@
+from typing import Callable
+from sqlalchemy import Connection
+
+# Every entry upgrades the schema by one version, the current version is kept in PRAGMA user_version.
+# Entries are applied in order and never edited once released: change the schema by appending one.
+# A step is either an SQL statement or a function of the connection, for changes plain DDL can't do.
+Step = str | Callable[[Connection], None]
+
+
+def _add_running_totals(conn: Connection):
+    """databases made by create_all after the running totals were introduced have the columns already"""
+    columns = {row[1] for row in conn.exec_driver_sql('PRAGMA table_info("Operations")')}
+    for column in ("planned_days", "actual_days"):
+        if column not in columns:
+            conn.exec_driver_sql(f'ALTER TABLE "Operations" ADD COLUMN {column} REAL NOT NULL DEFAULT 0')
+
+
+def _ranked_search(table: str) -> list[Step]:
+    """a contentless full-text index of table.name whose rowids are crud.search_key, replacing the one of 4"""
+    search = f'"{table}Search"'
+    key = "(length({0}name) << 32) | {0}id"
+    return [
+        *(f'DROP TRIGGER IF EXISTS "{table}Search_{event}"' for event in ("insert", "delete", "update")),
+        f"DROP TABLE IF EXISTS {search}",
+        f"""CREATE VIRTUAL TABLE {search} USING fts5(
+            name, content='', tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        )""",
+        f"""CREATE TRIGGER "{table}Search_insert" AFTER INSERT ON "{table}" BEGIN
+            INSERT INTO {search} (rowid, name) VALUES ({key.format("new.")}, new.name);
+        END""",
+        f"""CREATE TRIGGER "{table}Search_delete" AFTER DELETE ON "{table}" BEGIN
+            INSERT INTO {search} ({search}, rowid, name) VALUES ('delete', {key.format("old.")}, old.name);
+        END""",
+        f"""CREATE TRIGGER "{table}Search_update" AFTER UPDATE OF name ON "{table}" BEGIN
+            INSERT INTO {search} ({search}, rowid, name) VALUES ('delete', {key.format("old.")}, old.name);
+            INSERT INTO {search} (rowid, name) VALUES ({key.format("new.")}, new.name);
+        END""",
+        f'INSERT INTO {search} (rowid, name) SELECT {key.format("")}, name FROM "{table}"',
+    ]
+
+
+MIGRATIONS: list[list[Step]] = [
+    # 1: the tables, as create_all used to make them on every startup
+    [
+        """CREATE TABLE IF NOT EXISTS "Users" (
+            username VARCHAR NOT NULL,
+            password VARCHAR(60) NOT NULL,
+            first_name VARCHAR,
+            last_name VARCHAR,
+            middle_name VARCHAR,
+            is_admin BOOLEAN NOT NULL,
+            PRIMARY KEY (username)
+        )""",
+        """CREATE TABLE IF NOT EXISTS "Fields" (
+            name VARCHAR NOT NULL,
+            PRIMARY KEY (name)
+        )""",
+        """CREATE TABLE IF NOT EXISTS "Bushes" (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            field_name VARCHAR NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(field_name) REFERENCES "Fields" (name)
+        )""",
+        """CREATE TABLE IF NOT EXISTS "Wells" (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            parameters JSON NOT NULL,
+            bush_id INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(bush_id) REFERENCES "Bushes" (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS "Events" (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            description VARCHAR NOT NULL,
+            well_id INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(well_id) REFERENCES "Wells" (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS "Operations" (
+            id INTEGER NOT NULL,
+            "order" INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            parameters JSON NOT NULL,
+            is_complete BOOLEAN NOT NULL,
+            event_id INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(event_id) REFERENCES "Events" (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS "ExampleOperations" (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            parameters JSON NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+    ],
+    # 2: foreign keys, operation order within an event and example operation lookup by name
+    [
+        'CREATE INDEX IF NOT EXISTS "ix_Bushes_field_name" ON "Bushes" (field_name)',
+        'CREATE INDEX IF NOT EXISTS "ix_Wells_bush_id" ON "Wells" (bush_id)',
+        'CREATE INDEX IF NOT EXISTS "ix_Events_well_id" ON "Events" (well_id)',
+        'CREATE INDEX IF NOT EXISTS "ix_Operations_event_id_order" ON "Operations" (event_id, "order")',
+        'CREATE INDEX IF NOT EXISTS "ix_ExampleOperations_name" ON "ExampleOperations" (name)',
+    ],
+    # 3: the operation parameters crud.OPERATION_PARAMETERS filters on, the expressions have to stay identical
+    [
+        *(f"""CREATE INDEX IF NOT EXISTS "ix_Operations_{key}"
+              ON "Operations" (CAST(json_extract(parameters, '$.{key}') AS REAL))"""
+          for key in ("plannedDepth", "actualDepth", "plannedTime", "actualTime", "plannedNpt")),
+        """CREATE INDEX IF NOT EXISTS "ix_Operations_behindTime" ON "Operations" (
+            CAST(json_extract(parameters, '$.actualTime') AS REAL) - CAST(json_extract(parameters, '$.plannedTime') AS REAL)
+        )""",
+    ],
+    # 4: full-text indexes of names, kept in sync by triggers that only reindex a row when its name changes,
+    # not on every update of the running totals of an operation
+    [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS "ExampleOperationsSearch" USING fts5(
+            name, content='ExampleOperations', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS "ExampleOperationsSearch_insert" AFTER INSERT ON "ExampleOperations" BEGIN
+            INSERT INTO "ExampleOperationsSearch" (rowid, name) VALUES (new.id, new.name);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS "ExampleOperationsSearch_delete" AFTER DELETE ON "ExampleOperations" BEGIN
+            INSERT INTO "ExampleOperationsSearch" ("ExampleOperationsSearch", rowid, name) VALUES ('delete', old.id, old.name);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS "ExampleOperationsSearch_update" AFTER UPDATE OF name ON "ExampleOperations" BEGIN
+            INSERT INTO "ExampleOperationsSearch" ("ExampleOperationsSearch", rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO "ExampleOperationsSearch" (rowid, name) VALUES (new.id, new.name);
+        END""",
+        """INSERT INTO "ExampleOperationsSearch" ("ExampleOperationsSearch") VALUES ('rebuild')""",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS "OperationsSearch" USING fts5(
+            name, content='Operations', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS "OperationsSearch_insert" AFTER INSERT ON "Operations" BEGIN
+            INSERT INTO "OperationsSearch" (rowid, name) VALUES (new.id, new.name);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS "OperationsSearch_delete" AFTER DELETE ON "Operations" BEGIN
+            INSERT INTO "OperationsSearch" ("OperationsSearch", rowid, name) VALUES ('delete', old.id, old.name);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS "OperationsSearch_update" AFTER UPDATE OF name ON "Operations" BEGIN
+            INSERT INTO "OperationsSearch" ("OperationsSearch", rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO "OperationsSearch" (rowid, name) VALUES (new.id, new.name);
+        END""",
+        """INSERT INTO "OperationsSearch" ("OperationsSearch") VALUES ('rebuild')""",
+    ],
+    # 5: sparse order keys, operations were numbered 0, 1, 2... and are now crud.ORDER_STEP apart
+    [
+        'UPDATE "Operations" SET "order" = "order" * 65536',
+    ],
+    # 6: versions of parameters for optimistic concurrency
+    [
+        'ALTER TABLE "Wells" ADD COLUMN version INTEGER NOT NULL DEFAULT 1',
+        'ALTER TABLE "Operations" ADD COLUMN version INTEGER NOT NULL DEFAULT 1',
+    ],
+    # 7: running totals of plannedTime / actualTime in days, see crud._days, which 1 left out as the
+    # create_all schema it adopts never had them
+    [
+        _add_running_totals,
+        """UPDATE "Operations" SET planned_days = totals.planned_days, actual_days = totals.actual_days
+        FROM (
+            SELECT id,
+                SUM(COALESCE(CAST(json_extract(parameters, '$.plannedTime') AS REAL), 0) / 24) OVER running AS planned_days,
+                SUM(COALESCE(CAST(json_extract(parameters, '$.actualTime') AS REAL), 0) / 24) OVER running AS actual_days
+            FROM "Operations"
+            WINDOW running AS (PARTITION BY event_id ORDER BY "order", id ROWS UNBOUNDED PRECEDING)
+        ) AS totals
+        WHERE "Operations".id = totals.id""",
+    ],
+    # 8: the full-text indexes of 4 again, with rowids ordered by the length of the name, so the shortest
+    # matches stream out first and search_names never ranks every match of a short prefix
+    [
+        *_ranked_search("ExampleOperations"),
+        *_ranked_search("Operations"),
+    ],
+    # 9: revoked tokens, shared by every worker and kept across restarts
+    [
+        """CREATE TABLE IF NOT EXISTS "RevokedTokens" (
+            token_hash VARCHAR NOT NULL,
+            expires FLOAT NOT NULL,
+            PRIMARY KEY (token_hash)
+        )""",
+        'CREATE INDEX IF NOT EXISTS "ix_RevokedTokens_expires" ON "RevokedTokens" (expires)',
+    ],
+    # 10: export jobs, shared by every worker
+    [
+        """CREATE TABLE IF NOT EXISTS "ExportJobs" (
+            id VARCHAR NOT NULL,
+            kind VARCHAR NOT NULL,
+            target VARCHAR NOT NULL,
+            computed BOOLEAN NOT NULL,
+            status VARCHAR NOT NULL,
+            progress FLOAT NOT NULL,
+            error VARCHAR,
+            result BLOB,
+            size INTEGER NOT NULL,
+            created FLOAT NOT NULL,
+            updated FLOAT NOT NULL,
+            finished FLOAT,
+            PRIMARY KEY (id)
+        )""",
+        'CREATE INDEX IF NOT EXISTS "ix_ExportJobs_status_created" ON "ExportJobs" (status, created)',
+        'CREATE INDEX IF NOT EXISTS "ix_ExportJobs_request" ON "ExportJobs" (kind, target, computed)',
+    ],
+]
+
+
+def get_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def upgrade(conn: Connection):
+    """brings the schema up to date, meant to run inside the transaction that holds the write lock,
+    so workers starting at once apply every migration exactly once"""
+    version = get_version(conn)
+    for number, steps in enumerate(MIGRATIONS[version:], version + 1):
+        for step in steps:
+            if isinstance(step, str):
+                conn.exec_driver_sql(step)
+            else:
+                step(conn)
+        conn.exec_driver_sql(f"PRAGMA user_version={number}")
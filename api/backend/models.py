@@ -1,10 +1,15 @@
-import os
-from sqlalchemy import String, ForeignKey, JSON
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy.ext.orderinglist import OrderingList, ordering_list
+import asyncio
+import json
+from functools import partial
+from sqlalchemy import String, ForeignKey, JSON, Index, LargeBinary, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util import await_only
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, deferred
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 from datetime import time
 import config
+import migrations
 
 
 class Base(DeclarativeBase):
@@ -27,7 +32,7 @@ class Field(Base):
 
     name: Mapped[str] = mapped_column(primary_key=True)
 
-    bushes: Mapped[list["Bush"]] = relationship(back_populates="field", lazy="joined")
+    bushes: Mapped[list["Bush"]] = relationship(back_populates="field", order_by="Bush.id")
 
 
 class Bush(Base):
@@ -35,10 +40,10 @@ class Bush(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str]
-    field_name: Mapped[int] = mapped_column(ForeignKey("Fields.name"))
+    field_name: Mapped[int] = mapped_column(ForeignKey("Fields.name"), index=True)
 
-    wells: Mapped[list["Well"]] = relationship(back_populates="bush", lazy="joined")
-    field: Mapped["Field"] = relationship(back_populates="bushes", lazy="joined")
+    wells: Mapped[list["Well"]] = relationship(back_populates="bush", order_by="Well.id")
+    field: Mapped["Field"] = relationship(back_populates="bushes")
 
 
 class Well(Base):
@@ -47,10 +52,12 @@ class Well(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str]
     parameters: Mapped[dict] = mapped_column(JSON())
-    bush_id: Mapped[int] = mapped_column(ForeignKey("Bushes.id"))
+    bush_id: Mapped[int] = mapped_column(ForeignKey("Bushes.id"), index=True)
+    # bumped by every change of parameters, for If-Match
+    version: Mapped[int] = mapped_column(default=1)
 
-    events: Mapped[list["Event"]] = relationship(back_populates="well", lazy="joined")
-    bush: Mapped["Bush"] = relationship(back_populates="wells", lazy="joined")
+    events: Mapped[list["Event"]] = relationship(back_populates="well", order_by="Event.id")
+    bush: Mapped["Bush"] = relationship(back_populates="wells")
 
 
 class Event(Base):
@@ -59,38 +66,141 @@ class Event(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str]
     description: Mapped[str]
-    well_id: Mapped[int] = mapped_column(ForeignKey("Wells.id"))
+    well_id: Mapped[int] = mapped_column(ForeignKey("Wells.id"), index=True)
 
-    operations: Mapped[OrderingList["Operation"]] = relationship(collection_class=ordering_list("order", count_from=0), back_populates="event", order_by="Operation.order", lazy="joined")
-    well: Mapped["Well"] = relationship(back_populates="events", lazy="joined")
+    operations: Mapped[list["Operation"]] = relationship(back_populates="event", order_by="Operation.order")
+    well: Mapped["Well"] = relationship(back_populates="events")
 
 
 class Operation(Base):
     __tablename__ = "Operations"
+    __table_args__ = (Index("ix_Operations_event_id_order", "event_id", "order"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # sparse sort key within the event, see crud.ORDER_STEP
     order: Mapped[int]
     name: Mapped[str]
     parameters: Mapped[dict] = mapped_column(JSON())
     is_complete: Mapped[bool]
     event_id: Mapped[int] = mapped_column(ForeignKey("Events.id"))
-
-    event: Mapped["Event"] = relationship(back_populates="operations", lazy="joined")
+    # running totals of plannedTime / actualTime in days up to and including this operation
+    planned_days: Mapped[float] = mapped_column(default=0.0)
+    actual_days: Mapped[float] = mapped_column(default=0.0)
+    # bumped by every change of parameters, for If-Match
+    version: Mapped[int] = mapped_column(default=1)
+
+    event: Mapped["Event"] = relationship(back_populates="operations")
+
+
+class RevokedToken(Base):
+    __tablename__ = "RevokedTokens"
+
+    # sha256 of the token, the tokens themselves are never stored
+    token_hash: Mapped[str] = mapped_column(primary_key=True)
+    expires: Mapped[float] = mapped_column(index=True)
+
+
+class ExportJob(Base):
+    """an export of jobs.JobQueue, kept in the database so every worker sees every job"""
+    __tablename__ = "ExportJobs"
+    __table_args__ = (
+        Index("ix_ExportJobs_status_created", "status", "created"),
+        Index("ix_ExportJobs_request", "kind", "target", "computed"),
+    )
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    kind: Mapped[str]
+    target: Mapped[str]
+    computed: Mapped[bool]
+    status: Mapped[str]
+    progress: Mapped[float] = mapped_column(default=0.0)
+    error: Mapped[str | None]
+    # the xlsx file, only loaded for downloads
+    result: Mapped[bytes | None] = deferred(mapped_column(LargeBinary))
+    size: Mapped[int] = mapped_column(default=0)
+    created: Mapped[float]
+    # the heartbeat of the worker running the job
+    updated: Mapped[float]
+    finished: Mapped[float | None]
 
 
 class ExampleOperation(Base):
     __tablename__ = "ExampleOperations"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    name: Mapped[str]
+    name: Mapped[str] = mapped_column(index=True)
     parameters: Mapped[dict] = mapped_column(JSON())
 
 
-engine = create_async_engine(config.DB_URL, echo=True)
+def _set_pragmas(dbapi_connection, query_only: bool):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run alongside the single writer, NORMAL only syncs on checkpoints in WAL mode
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={config.DB_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={config.DB_MMAP_SIZE}")
+    if query_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def _begin_immediate(conn):
+    """takes the database write lock up front, so a transaction that has read something never fails
+    on its first write because another process committed in between; retries once busy_timeout runs out"""
+    cursor = conn.connection.dbapi_connection.cursor()
+    for attempt in range(config.DB_WRITE_RETRIES + 1):
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            break
+        except Exception as e:
+            if "locked" not in str(e) or attempt == config.DB_WRITE_RETRIES:
+                raise
+            await_only(asyncio.sleep(0.05 * 2 ** attempt))
+    cursor.close()
+
+
+def _begin_deferred(conn):
+    """a read transaction, so every statement of a session reads the same snapshot even while the writer
+    commits in between, e.g. the selectinloads of one get_fields"""
+    cursor = conn.connection.dbapi_connection.cursor()
+    cursor.execute("BEGIN")
+    cursor.close()
+
+
+def _sqlite_engine(query_only: bool, pool_size: int) -> AsyncEngine:
+    # JSON is stored unescaped, sqlite's json_extract matches keys against the raw text
+    res = create_async_engine(config.DB_URL, echo=True, poolclass=AsyncAdaptedQueuePool, pool_size=pool_size,
+                              max_overflow=0, pool_timeout=config.DB_POOL_TIMEOUT,
+                              json_serializer=partial(json.dumps, ensure_ascii=False))
+
+    @event.listens_for(res.sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        _set_pragmas(dbapi_connection, query_only)
+        # transactions are begun by hand below
+        dbapi_connection.isolation_level = None
+
+    event.listen(res.sync_engine, "begin", _begin_deferred if query_only else _begin_immediate)
+    return res
+
+
+if make_url(config.DB_URL).get_backend_name() == "sqlite":
+    # every process has one writer connection, so its writes queue up in the pool instead of fighting
+    # over the database lock, and a pool of query_only connections for everything that only reads
+    engine = _sqlite_engine(False, 1)
+    read_engine = _sqlite_engine(True, config.DB_READ_POOL_SIZE)
+else:
+    engine = read_engine = create_async_engine(config.DB_URL, echo=True)
 async_session: async_sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+read_session: async_sessionmaker = async_sessionmaker(read_engine, expire_on_commit=False)
 
 
 async def init_engine():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "sqlite":
+            await conn.run_sync(migrations.upgrade)
+        else:
+            await conn.run_sync(Base.metadata.create_all)
+    # the first connection of an engine sets up its dialect under a thread lock, which blocks the event
+    # loop if another task connects meanwhile, so it is made here before anything runs concurrently
+    async with read_engine.connect():
+        pass
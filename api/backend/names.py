@@ -0,0 +1,32 @@
+import re
+from functools import lru_cache
+
+PLACEHOLDER = re.compile(r'%([^%]+)%')
+NOT_FOUND = '%NOT FOUND%'
+
+
+@lru_cache(maxsize=4096)
+def parse(name: str) -> tuple[tuple[bool, str], ...]:
+    """splits an operation name into (is_placeholder, text) parts, `%param%` becomes (True, 'param')"""
+    parts = []
+    position = 0
+    for match in PLACEHOLDER.finditer(name):
+        if match.start() > position:
+            parts.append((False, name[position:match.start()]))
+        parts.append((True, match.group(1)))
+        position = match.end()
+    if position < len(name):
+        parts.append((False, name[position:]))
+    return tuple(parts)
+
+
+def render(name: str, parameters: dict) -> str:
+    """substitutes every `%param%` of the name with the well parameter, or %NOT FOUND% if there is none"""
+    return ''.join(
+        str(parameters.get(text, NOT_FOUND)) if is_placeholder else text
+        for is_placeholder, text in parse(name)
+    )
+
+
+def render_all(names: list[str], parameters: dict) -> list[str]:
+    return [render(name, parameters) for name in names]
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from typing import Literal
+from pydantic import BaseModel, constr, validator
+from pydantic.utils import GetterDict
+from sqlalchemy import inspect
 
 
 class Token(BaseModel):
@@ -81,6 +84,7 @@ class OperationCreate(OperationBase):
 class Operation(OperationBase):
     order: int
     id: int
+    version: int
 
 
 class Event(EventBase):
@@ -103,6 +107,7 @@ class WellCreate(WellBase):
 
 class Well(WellBase):
     id: int
+    version: int
     events: list[Event]
 
 
@@ -132,6 +137,162 @@ class ExampleOperationCreate(ExampleOperationBase):
 class ExampleOperation(ExampleOperationBase):
     id: int
 
+
+class NameSuggestion(BaseModel):
+    name: str
+    example: ExampleOperation | None
+
 class Dots(BaseModel):
     planned: list[tuple[float, float]]
     actual: list[tuple[float, float]]
+
+
+class EventDots(Dots):
+    event_id: int
+
+
+class LoadedGetterDict(GetterDict):
+    """reads only attributes the query has loaded, so the tree stops where the query stopped"""
+
+    def get(self, key, default=None):
+        if key in inspect(self._obj).unloaded:
+            return default
+        return getattr(self._obj, key, default)
+
+
+class EventNode(EventBase):
+    id: int
+    description: str
+    operations: list[Operation] | None = None
+
+    class Config:
+        getter_dict = LoadedGetterDict
+
+
+class WellNode(WellBase):
+    id: int
+    version: int
+    events: list[EventNode] | None = None
+
+    class Config:
+        getter_dict = LoadedGetterDict
+
+
+class BushNode(Bush):
+    wells: list[WellNode] | None = None
+
+    class Config:
+        getter_dict = LoadedGetterDict
+
+
+class FieldNode(FieldBase):
+    bushes: list[BushNode] | None = None
+
+    class Config:
+        getter_dict = LoadedGetterDict
+
+
+class FieldPage(BaseModel):
+    items: list[FieldNode]
+    next_cursor: str | None
+
+
+class BushPage(BaseModel):
+    items: list[BushNode]
+    next_cursor: int | None
+
+
+class WellPage(BaseModel):
+    items: list[WellNode]
+    next_cursor: int | None
+
+
+class EventPage(BaseModel):
+    items: list[EventNode]
+    next_cursor: int | None
+
+
+class OperationPage(BaseModel):
+    items: list[Operation]
+    next_cursor: int | None
+
+
+class OperationSearchPage(BaseModel):
+    items: list[Operation]
+    next_cursor: str | None
+
+
+class ExportJobCreate(BaseModel):
+    kind: Literal["event", "bush", "field"]
+    # an event or bush ID, or a field name
+    target: str
+    computed: bool = False
+
+    @validator("target")
+    def target_is_id(cls, target, values):
+        if values.get("kind") in ("event", "bush") and not target.isdigit():
+            raise ValueError("target must be an ID for the event and bush kinds")
+        return target
+
+
+class ExportJob(BaseModel):
+    id: str
+    status: str
+    progress: float
+    error: str | None
+
+    class Config:
+        orm_mode = True
+
+
+class RenderNames(BaseModel):
+    well_id: int
+    names: list[str]
+
+
+class WriteBatchMetrics(BaseModel):
+    batches: int
+    writes: int
+    failed_writes: int
+    failed_invalidations: int
+    mean_batch_size: float
+    max_batch_size: int
+    mean_commit_ms: float
+    max_commit_ms: float
+    last_commit_ms: float
+
+
+class ParameterFilter(BaseModel):
+    key: str
+    op: Literal["eq", "ne", "lt", "le", "gt", "ge", "exists", "missing"] = "eq"
+    value: float | str | None = None
+
+    @validator("value", always=True)
+    def value_is_given(cls, value, values):
+        if value is None and values.get("op") not in ("exists", "missing"):
+            raise ValueError("value is required unless op is exists or missing")
+        return value
+
+
+class OperationFilter(ParameterFilter):
+    key: Literal["plannedDepth", "actualDepth", "plannedTime", "actualTime", "plannedNpt", "behindTime"]
+    value: float | None = None
+
+
+class WellFilter(ParameterFilter):
+    key: constr(regex=r'^[^"\\]+$')
+
+
+class OperationSearch(BaseModel):
+    filters: list[OperationFilter] = []
+    event_id: int | None = None
+
+
+class WellSearch(BaseModel):
+    filters: list[WellFilter] = []
+    bush_id: int | None = None
+
+
+class VersionedParameters(BaseModel):
+    version: int
+    parameters: dict
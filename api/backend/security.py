@@ -1,28 +1,42 @@
+import asyncio
+import hashlib
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict
 
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from fastapi import Depends, Request, HTTPException
+from sqlalchemy import select, delete, insert
 from sqlalchemy.ext.asyncio import AsyncSession
+import cache
 import config
+import models
 
 from jose import jwt
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min == max == default, so a hash with any other cost is reported as needing an update
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__default_rounds=config.BCRYPT_ROUNDS,
+                           bcrypt__min_rounds=config.BCRYPT_ROUNDS,
+                           bcrypt__max_rounds=config.BCRYPT_ROUNDS)
+# bcrypt releases the GIL, so a few threads keep hashing off the event loop
+hash_executor = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 SECRET_KEY = config.SECRET_KEY_JWT
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = config.ACCESS_TOKEN_EXPIRE_MINUTES
 
 
-def verify_password(password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(password, hashed_password)
+async def verify_password(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """returns whether the password matches and, if the hash cost changed, a new hash to store"""
+    return await asyncio.get_running_loop().run_in_executor(
+        hash_executor, pwd_context.verify_and_update, password, hashed_password)
 
 
-def get_hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(hash_executor, pwd_context.hash, password)
 
 
 def token_response(token: str):
@@ -31,9 +45,84 @@ def token_response(token: str):
     }
 
 
-def decode_jwt(token: str) -> dict | None:
-    decoded_token = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    return decoded_token if decoded_token["expires"] >= time.time() else None
+# token -> payload, kept until the token expires so a request decodes its token at most once
+decoded_tokens: dict[str, dict] = {}
+# Revoked tokens are kept in the RevokedTokens table and users in Users. Every worker holds a copy of the
+# revoked tokens and caches users as of auth_version, its last seen version of cache.AUTH; a revocation
+# or a change of a user replaces that version, so every worker reloads on its next request.
+auth_version: str | None = None
+# sha256 of revoked tokens that haven't expired
+revoked_tokens: set[str] = set()
+# username -> (cached until, auth_version it was read at, user)
+cached_users: dict[str, tuple[float, str | None, object]] = {}
+
+
+def _forget_expired(tokens: dict, expires_of):
+    now = time.time()
+    for token in [token for token, value in tokens.items() if expires_of(value) < now]:
+        del tokens[token]
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def sync_auth():
+    """reloads the revoked tokens and drops the cached users if another request or worker changed them"""
+    global auth_version, revoked_tokens
+    version = await cache.version(cache.AUTH)
+    if version == auth_version:
+        return
+    async with models.read_session() as session:
+        revoked_tokens = set((await session.execute(
+            select(models.RevokedToken.token_hash).where(models.RevokedToken.expires >= time.time())
+        )).scalars())
+    cached_users.clear()
+    auth_version = version
+
+
+async def decode_jwt(token: str) -> dict | None:
+    decoded_token = decoded_tokens.get(token)
+    if decoded_token is None:
+        decoded_token = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if len(decoded_tokens) >= config.TOKEN_CACHE_MAX_ENTRIES:
+            _forget_expired(decoded_tokens, lambda payload: payload["expires"])
+            if len(decoded_tokens) >= config.TOKEN_CACHE_MAX_ENTRIES:
+                decoded_tokens.clear()
+        decoded_tokens[token] = decoded_token
+    if decoded_token["expires"] < time.time():
+        return None
+    await sync_auth()
+    return None if token_hash(token) in revoked_tokens else decoded_token
+
+
+async def revoke_jwt(token: str):
+    decoded_token = decoded_tokens.pop(token, None) or jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    async with models.async_session() as session:
+        await session.execute(delete(models.RevokedToken).where(models.RevokedToken.expires < time.time()))
+        await session.execute(insert(models.RevokedToken).prefix_with("OR IGNORE").values(
+            token_hash=token_hash(token), expires=decoded_token["expires"]))
+        await session.commit()
+    await cache.invalidate(cache.AUTH)
+
+
+def get_cached_user(username: str):
+    entry = cached_users.get(username)
+    if entry is None or entry[0] < time.monotonic() or entry[1] != auth_version:
+        return None
+    return entry[2]
+
+
+def cache_user(user, version: str | None):
+    """caches a user read while auth_version was version, unless that changed in the meantime"""
+    if version == auth_version:
+        cached_users[user.username] = (time.monotonic() + config.USER_CACHE_TTL_SECONDS, version, user)
+
+
+async def forget_user(username: str):
+    """every worker drops its cached users, not just this one"""
+    cached_users.pop(username, None)
+    await cache.invalidate(cache.AUTH)
 
 
 def sign_jwt(user_id: str) -> Dict[str, str]:
@@ -55,16 +144,16 @@ class JWTBearer(HTTPBearer):
         if credentials:
             if not credentials.scheme == "Bearer":
                 raise HTTPException(status_code=403, detail="Invalid authentication scheme.")
-            if not self.verify_jwt(credentials.credentials):
+            if not await self.verify_jwt(credentials.credentials):
                 raise HTTPException(status_code=403, detail="Invalid token or expired token.")
             return credentials.credentials
         else:
             raise HTTPException(status_code=403, detail="Invalid authorization code.")
 
-    def verify_jwt(self, jwtoken: str) -> bool:
+    async def verify_jwt(self, jwtoken: str) -> bool:
         isTokenValid: bool = False
         try:
-            payload = decode_jwt(jwtoken)
+            payload = await decode_jwt(jwtoken)
         except:
             payload = None
         if payload:
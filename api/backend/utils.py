@@ -1,44 +1,221 @@
+import json
+from typing import AsyncIterator, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
-import re
-from crud import get_well_by_id, get_event_by_id
-from schemas import Dots
+import numpy as np
+import names
+from crud import get_well_by_id, get_event_by_id, get_curve_columns, get_curve_columns_of_scope, stream_field_tree, get_events_of_bush, get_events_of_field, get_event_rows
+from models import Event
+from schemas import Dots, EventDots
 
 
 async def replace_patterns_in_name(db: AsyncSession, well_id: int, operation_name: str) -> str | None:
     well = await get_well_by_id(db, well_id)
     if well is None:
         return None
-    parameters: dict = well.parameters
-    return re.sub(r'%(.*)%', lambda x: parameters.get(x.group(1), '%NOT FOUND%'), operation_name)
+    return names.render(operation_name, well.parameters)
 
 
-async def get_dots(db: AsyncSession, event_id: int) -> Dots | None:
-    event = await get_event_by_id(db, event_id)
-    if event is None:
+async def replace_patterns_in_names(db: AsyncSession, well_id: int, operation_names: list[str]) -> list[str] | None:
+    well = await get_well_by_id(db, well_id)
+    if well is None:
+        return None
+    return names.render_all(operation_names, well.parameters)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """indices of the points Largest-Triangle-Three-Buckets keeps, always including the first and the last"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end < n - 1:
+            cx, cy = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            cx, cy = x[n - 1], y[n - 1]
+        areas = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def _curve(days: np.ndarray, depths: np.ndarray, max_points: int | None) -> list[tuple[float, float]]:
+    if max_points is not None:
+        kept = lttb(days, depths, max_points)
+        days, depths = days[kept], depths[kept]
+    return list(zip(days.tolist(), depths.tolist()))
+
+
+async def get_dots(db: AsyncSession, event_id: int, max_points: int | None = None) -> Dots | None:
+    rows = await get_curve_columns(db, event_id)
+    if rows is None:
         return None
-    planned = []
-    actual = []
-    planned_day = 0
-    actual_day = 0
-    for operation in event.operations:
-        planned_depth = float(operation.parameters.get('plannedDepth'))
-        actual_depth = float(operation.parameters.get('actualDepth'))
-        planned_day = float(operation.parameters.get('plannedTime')) / 24 + planned_day
-        actual_day = float(operation.parameters.get('actualTime')) / 24 + actual_day
-        planned.append((planned_day, planned_depth))
-        actual.append((actual_day, actual_depth))
-    return Dots(planned=planned, actual=actual)
+    columns = np.array(rows, dtype=float).reshape(-1, 4)
+    return Dots(
+        planned=_curve(columns[:, 0], columns[:, 1], max_points),
+        actual=_curve(columns[:, 2], columns[:, 3], max_points)
+    )
+
+
+async def get_dots_of_scope(db: AsyncSession, well_id: int | None = None, bush_id: int | None = None,
+                            field_name: str | None = None, max_points: int | None = None) -> list[EventDots]:
+    event_ids, rows = await get_curve_columns_of_scope(db, well_id, bush_id, field_name)
+    columns = np.array(rows, dtype=float).reshape(-1, 5)
+    # rows come sorted by event, so every event's operations are one contiguous slice
+    starts = np.searchsorted(columns[:, 0], event_ids, side='left')
+    stops = np.searchsorted(columns[:, 0], event_ids, side='right')
+    return [
+        EventDots(
+            event_id=event_id,
+            planned=_curve(columns[start:stop, 1], columns[start:stop, 2], max_points),
+            actual=_curve(columns[start:stop, 3], columns[start:stop, 4], max_points)
+        )
+        for event_id, start, stop in zip(event_ids, starts, stops)
+    ]
 
 
 async def get_data_of_event_for_excel(db: AsyncSession, event_id: int) -> list | None:
     event = await get_event_by_id(db, event_id)
     if event is None:
         return None
+    well = await get_well_by_id(db, event.well_id)
     data = []
-    for operation in event.operations:
+    for position, operation in enumerate(event.operations):
         data.append({
-            'id': operation.order,
-            'name': await replace_patterns_in_name(db, event.well_id, operation.name),
+            'id': position,
+            'name': None if well is None else names.render(operation.name, well.parameters),
             'parameters': operation.parameters
         })
     return data
+
+
+def _events_for_excel(events: Sequence[Event]) -> list[tuple[str, list]]:
+    return [
+        (f"{event.well.name} {event.name}", [{
+            'id': position,
+            'name': names.render(operation.name, event.well.parameters),
+            'parameters': operation.parameters
+        } for position, operation in enumerate(event.operations)])
+        for event in events
+    ]
+
+
+async def get_data_of_bush_for_excel(db: AsyncSession, bush_id: int) -> list[tuple[str, list]]:
+    """(sheet title, rows) for every event of the bush"""
+    return _events_for_excel(await get_events_of_bush(db, bush_id))
+
+
+async def get_data_of_field_for_excel(db: AsyncSession, field_name: str) -> list[tuple[str, list]]:
+    """(sheet title, rows) for every event of the field"""
+    return _events_for_excel(await get_events_of_field(db, field_name))
+
+
+def _ndjson(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+async def stream_fields_ndjson(db: AsyncSession) -> AsyncIterator[str]:
+    """yields a record per field followed by a record per bush of it with the whole subtree of the bush"""
+    field_name = None
+    bush = well = event = None
+    async for row in await stream_field_tree(db):
+        if row.field_name != field_name:
+            if bush is not None:
+                yield _ndjson(bush)
+                bush = None
+            field_name = row.field_name
+            yield _ndjson({'type': 'field', 'name': field_name})
+        if row.bush_id is None:
+            continue
+        if bush is None or bush['id'] != row.bush_id:
+            if bush is not None:
+                yield _ndjson(bush)
+            bush = {'type': 'bush', 'field_name': field_name, 'id': row.bush_id, 'name': row.bush_name, 'wells': []}
+            well = None
+        if row.well_id is None:
+            continue
+        if well is None or well['id'] != row.well_id:
+            well = _well_record(row)
+            bush['wells'].append(well)
+            event = None
+        if row.event_id is None:
+            continue
+        if event is None or event['id'] != row.event_id:
+            event = _event_record(row)
+            well['events'].append(event)
+        if row.operation_id is None:
+            continue
+        event['operations'].append(_operation_record(row))
+    if bush is not None:
+        yield _ndjson(bush)
+
+
+# The records below have the shape of the schemas.py models, built straight from stream_field_tree rows,
+# so they can be encoded without a from_orm and response_model round trip.
+
+def _well_record(row) -> dict:
+    return {'id': row.well_id, 'name': row.well_name, 'parameters': row.well_parameters,
+            'version': row.well_version, 'events': []}
+
+
+def _event_record(row) -> dict:
+    return {'id': row.event_id, 'name': row.event_name, 'description': row.event_description, 'operations': []}
+
+
+def _operation_record(row) -> dict:
+    return {
+        'id': row.operation_id,
+        'order': row.operation_order,
+        'name': row.operation_name,
+        'parameters': row.operation_parameters,
+        'is_complete': row.operation_is_complete,
+        'version': row.operation_version
+    }
+
+
+async def get_fields_records(db: AsyncSession) -> list[dict]:
+    """the /get_fields tree (list[schemas.Field]) as plain dicts"""
+    fields = []
+    field = bush = well = event = None
+    async for row in await stream_field_tree(db):
+        if field is None or field['name'] != row.field_name:
+            field = {'name': row.field_name, 'bushes': []}
+            fields.append(field)
+            bush = None
+        if row.bush_id is None:
+            continue
+        if bush is None or bush['id'] != row.bush_id:
+            bush = {'id': row.bush_id, 'name': row.bush_name, 'wells': []}
+            field['bushes'].append(bush)
+            well = None
+        if row.well_id is None:
+            continue
+        if well is None or well['id'] != row.well_id:
+            well = _well_record(row)
+            bush['wells'].append(well)
+            event = None
+        if row.event_id is None:
+            continue
+        if event is None or event['id'] != row.event_id:
+            event = _event_record(row)
+            well['events'].append(event)
+        if row.operation_id is None:
+            continue
+        event['operations'].append(_operation_record(row))
+    return fields
+
+
+async def get_event_record(db: AsyncSession, event_id: int) -> dict | None:
+    """an event with its operations (schemas.Event) as a plain dict"""
+    rows = (await get_event_rows(db, event_id)).all()
+    if not rows:
+        return None
+    event = _event_record(rows[0])
+    event['operations'] = [_operation_record(row) for row in rows if row.operation_id is not None]
+    return event
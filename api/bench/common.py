@@ -0,0 +1,37 @@
+"""setup shared by the benchmarks: a throwaway database, the backend on sys.path and timing helpers
+
+Run them from api/, e.g. `python bench/excel_rows.py`."""
+import os
+import statistics
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend")
+DB_FILE = os.path.join(tempfile.mkdtemp(), "api.db")
+os.environ.setdefault("DB_URL", f"sqlite+aiosqlite:///{DB_FILE}")
+os.environ.setdefault("SECRET_KEY_JWT", "bench")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+sys.path.insert(0, BACKEND)
+
+
+def quiet(models):
+    """the engines echo every statement, which would be most of what gets measured"""
+    models.engine.sync_engine.echo = False
+    models.read_engine.sync_engine.echo = False
+
+
+def operation_rows(n: int) -> list[dict]:
+    """rows as utils.get_data_of_event_for_excel makes them"""
+    return [{
+        "id": i,
+        "name": f"Бурение интервала {i}",
+        "parameters": {"plannedTime": 2, "plannedDepth": 10 * i, "actualTime": 3, "actualDepth": 11 * i,
+                       "plannedNpt": 0.5, "nptComment": "", "actualIlt": 0.25},
+    } for i in range(n)]
+
+
+def latencies(samples: list[float]) -> str:
+    """p50 / p99 / max of samples in seconds, as milliseconds"""
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50 {1000 * statistics.median(samples):8.1f} ms  p99 {1000 * p99:8.1f} ms  max {1000 * samples[-1]:8.1f} ms"
@@ -0,0 +1,44 @@
+"""event report rendering: the old Excel.create_section against the row template
+
+Excel.create_section (old and current) keeps the whole sheet in memory, so it is only run up to
+--in-memory-max rows; excel.report.write_event_report streams and is run at every size, writing
+formulas and, with computed=True, numbers."""
+import argparse
+import io
+import os
+import tempfile
+import time
+from common import operation_rows
+from excel.main import Excel
+from excel.report import PATTERN_FILE, write_event_report
+import legacy_excel
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+parser.add_argument("--in-memory-max", type=int, default=100_000)
+args = parser.parse_args()
+
+
+def create_section(cls, data: list[dict]):
+    excel = cls(os.path.join(tempfile.mkdtemp(), "report.xlsx"))
+    os.chdir(os.path.dirname(PATTERN_FILE))
+    excel.get_pattern(os.path.basename(PATTERN_FILE))
+    excel.create_section(data)
+
+
+RENDERERS = {
+    "old create_section": (lambda data: create_section(legacy_excel.Excel, data), True),
+    "create_section": (lambda data: create_section(Excel, data), True),
+    "streamed, formulas": (lambda data: write_event_report(io.BytesIO(), data), False),
+    "streamed, computed": (lambda data: write_event_report(io.BytesIO(), data, computed=True), False),
+}
+
+for rows in args.rows:
+    data = operation_rows(rows)
+    for name, (render, in_memory) in RENDERERS.items():
+        if in_memory and rows > args.in_memory_max:
+            print(f"{rows:>9} rows  {name:20}  skipped, over --in-memory-max")
+            continue
+        started = time.perf_counter()
+        render(data)
+        print(f"{rows:>9} rows  {name:20}  {time.perf_counter() - started:8.2f} s")
@@ -0,0 +1,82 @@
+"""/get_fields bodies: from_orm and the stdlib json against the FAST_JSON path (Core rows and orjson)
+
+Times what a cache miss of the route does on either path, at every --operations size, spread over
+events of 100 operations in turn over the wells of several fields, bushes and wells, the fields created
+out of name order. Both bodies are checked to decode to the same tree, in the same order."""
+import argparse
+import asyncio
+import json
+import time
+from common import quiet
+import cache
+import crud
+import models
+import schemas
+import utils
+
+OPERATIONS_PER_EVENT = 100
+FIELDS = ("Zeta", "Alpha", "Mu")
+BUSHES = 2
+WELLS = 3
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--operations", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+parser.add_argument("--repeat", type=int, default=3)
+args = parser.parse_args()
+
+
+async def orm_body() -> bytes:
+    async with models.read_session() as session:
+        return cache.encode([schemas.Field.from_orm(field) for field in await crud.get_fields(session)])
+
+
+async def fast_body() -> bytes:
+    async with models.read_session() as session:
+        return cache.encode_records(await utils.get_fields_records(session))
+
+
+async def grow(well_ids: list[int], operations: int, target: int) -> int:
+    async with models.async_session() as session:
+        while operations < target:
+            well_id = well_ids[operations // OPERATIONS_PER_EVENT % len(well_ids)]
+            event = await crud.create_event(session, schemas.EventCreate(name="E", description="", well_id=well_id))
+            await crud.create_operations(session, [schemas.OperationCreate(
+                name=f"Бурение %x% {o}", is_complete=False, event_id=event.id,
+                parameters={"plannedTime": 2, "actualTime": 3, "plannedDepth": o, "actualDepth": o},
+            ) for o in range(OPERATIONS_PER_EVENT)])
+            operations += OPERATIONS_PER_EVENT
+    return operations
+
+
+async def run():
+    quiet(models)
+    await models.init_engine()
+    well_ids = []
+    async with models.async_session() as session:
+        for field_name in FIELDS:
+            await crud.create_field(session, schemas.FieldBase(name=field_name))
+            for b in range(BUSHES):
+                bush = await crud.create_bush(session, schemas.BushCreate(name=f"B{b}", field_name=field_name))
+                for w in range(WELLS):
+                    well = await crud.create_well(session, schemas.WellCreate(
+                        name=f"W{w}", parameters={"x": str(w)}, bush_id=bush.id))
+                    well_ids.append(well.id)
+    operations = 0
+    for target in args.operations:
+        operations = await grow(well_ids, operations, target)
+        timings = {}
+        for name, build in (("from_orm + json", orm_body), ("rows + orjson", fast_body)):
+            best = None
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                body = await build()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = (best, json.loads(body))
+        (orm, orm_tree), (fast, fast_tree) = timings.values()
+        assert orm_tree == fast_tree
+        print(f"{operations:>7} operations  from_orm + json {orm:7.3f} s  rows + orjson {fast:7.3f} s  "
+              f"x{orm / fast:.1f}")
+
+
+asyncio.run(run())
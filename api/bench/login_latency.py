@@ -0,0 +1,64 @@
+"""latency of a cheap endpoint (a cached /get_fields) while logins are in flight
+
+Three runs: the endpoint alone, alongside concurrent logins hashed on security.hash_executor, and alongside
+the same logins verified inline on the event loop, as they were before hashing moved off it."""
+import argparse
+import asyncio
+import time
+from common import latencies, quiet
+import httpx
+import main
+import models
+import security
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--logins", type=int, default=16, help="concurrent clients logging in over and over")
+parser.add_argument("--probes", type=int, default=200, help="requests to the cheap endpoint per run")
+args = parser.parse_args()
+
+
+async def verify_inline(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return security.pwd_context.verify_and_update(password, hashed_password)
+
+
+async def measure(client: httpx.AsyncClient, headers: dict, logins: int) -> tuple[list[float], int]:
+    """probe latencies and the number of logins done meanwhile"""
+    done = asyncio.Event()
+    counted = 0
+
+    async def log_in():
+        nonlocal counted
+        while not done.is_set():
+            await client.post("/login", json={"login": "admin", "password": "admin"})
+            counted += 1
+
+    tasks = [asyncio.create_task(log_in()) for _ in range(logins)]
+    samples = []
+    for _ in range(args.probes):
+        started = time.perf_counter()
+        assert (await client.get("/get_fields", headers=headers)).status_code == 200
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.005)
+    done.set()
+    await asyncio.gather(*tasks)
+    return samples, counted
+
+
+async def run():
+    quiet(models)
+    await main.app.router.startup()
+    try:
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+            token = (await client.post("/login", json={"login": "admin", "password": "admin"})).json()["obj"]
+            headers = {"Authorization": f"Bearer {token}"}
+            for label, logins, verify in (("no logins", 0, security.verify_password),
+                                          ("logins on hash_executor", args.logins, security.verify_password),
+                                          ("logins on the event loop", args.logins, verify_inline)):
+                main.verify_password = verify
+                samples, counted = await measure(client, headers, logins)
+                print(f"{label:28}{latencies(samples)}  {counted} logins")
+    finally:
+        await main.app.router.shutdown()
+
+
+asyncio.run(run())
@@ -0,0 +1,75 @@
+"""/search_operation_names latency: crud.search_names over --templates example operations and as many
+operations, whose names repeat every --distinct rows
+
+Prints p50 / p99 / max per query and exits non-zero if a p99 is over --bound-ms."""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from sqlalchemy import insert
+from common import latencies, quiet
+import crud
+import models
+import schemas
+
+VERBS = ["Бурение", "Спуск", "Подъём", "Промывка", "Цементирование", "Проработка", "Шаблонирование", "Сборка",
+         "Разборка", "Испытание", "Монтаж", "Демонтаж", "ОЗЦ", "Крепление", "Бурение бокового ствола"]
+OBJECTS = ["колонны", "кондуктора", "направления", "интервала", "скважины", "КНБК", "бурильных труб",
+           "обсадной колонны", "эксплуатационной колонны", "хвостовика", "ствола", "превентора"]
+# broad prefixes match most of the names, the rest only a few
+QUERIES = ["б", "бур", "м", "цем", "спуск колонна", "промывка хвостовика", "интервала 4500", "шабл ств 12"]
+OPERATIONS_PER_EVENT = 1000
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--templates", type=int, default=100_000)
+parser.add_argument("--distinct", type=int, default=5_000)
+parser.add_argument("--samples", type=int, default=200)
+parser.add_argument("--limit", type=int, default=10)
+parser.add_argument("--bound-ms", type=float, default=10)
+args = parser.parse_args()
+
+
+def name(i: int) -> str:
+    rng = random.Random(i)
+    return f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.randint(1, 5000)} м"
+
+
+async def seed():
+    await models.init_engine()
+    async with models.async_session() as session:
+        await session.execute(insert(models.ExampleOperation), [
+            {"name": name(i), "parameters": {}} for i in range(args.templates)])
+        await crud.create_field(session, schemas.FieldBase(name="F"))
+        bush = await crud.create_bush(session, schemas.BushCreate(name="B", field_name="F"))
+        well = await crud.create_well(session, schemas.WellCreate(name="W", parameters={}, bush_id=bush.id))
+        for start in range(0, args.templates, OPERATIONS_PER_EVENT):
+            event = await crud.create_event(session, schemas.EventCreate(name="E", description="", well_id=well.id))
+            await crud.create_operations(session, [schemas.OperationCreate(
+                name=name(i % args.distinct), parameters={}, is_complete=False, event_id=event.id
+            ) for i in range(start, min(start + OPERATIONS_PER_EVENT, args.templates))])
+    async with models.engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+
+
+async def run():
+    quiet(models)
+    await seed()
+    slow = []
+    async with models.read_session() as session:
+        for query in QUERIES:
+            samples = []
+            for _ in range(args.samples):
+                started = time.perf_counter()
+                await crud.search_names(session, query, args.limit)
+                samples.append(time.perf_counter() - started)
+            samples.sort()
+            if samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000 > args.bound_ms:
+                slow.append(query)
+            print(f"{query!r:>24}  {latencies(samples)}")
+    if slow:
+        print(f"p99 over {args.bound_ms} ms: {', '.join(slow)}")
+    return slow
+
+
+sys.exit(1 if asyncio.run(run()) else 0)
@@ -0,0 +1,205 @@
+"""multi-worker load through HTTP, as the container runs with MAX_WORKERS > 1
+
+For every worker count, uvicorn serves main:app with that many worker processes on one SQLite file, with the
+cache and auth state in Redis (--redis-url, which more than one worker needs). Reader tasks get events and
+fields through the cache, writer tasks update operation parameters, for --seconds. Then every check below
+opens a new connection per request, so its requests land on whichever worker accepts them:
+- an update is seen by every read after it (the cached bodies of all workers are invalidated),
+- a token is refused everywhere after logging out on one worker,
+- an export job submitted to one worker is polled and downloaded through the others.
+Reports throughput per worker count; exits non-zero if any request or check failed."""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import httpx
+from common import BACKEND, DB_FILE, quiet
+
+EVENTS = 50
+OPERATIONS = 40
+# requests per check, each on a new connection
+CHECKS = 20
+ADMIN = {"login": "admin", "password": "admin"}
+
+
+async def seed():
+    import crud
+    import models
+    import schemas
+    quiet(models)
+    await models.init_engine()
+    async with models.async_session() as session:
+        await crud.create_field(session, schemas.FieldBase(name="F"))
+        bush = await crud.create_bush(session, schemas.BushCreate(name="B", field_name="F"))
+        well = await crud.create_well(session, schemas.WellCreate(name="W", parameters={}, bush_id=bush.id))
+        for e in range(EVENTS):
+            event = await crud.create_event(session, schemas.EventCreate(name=f"E{e}", description="", well_id=well.id))
+            await crud.create_operations(session, [schemas.OperationCreate(
+                name=f"op {o}", is_complete=False, event_id=event.id,
+                parameters={"plannedTime": 2, "plannedDepth": 10 * o, "actualTime": 3, "actualDepth": 11 * o}
+            ) for o in range(OPERATIONS)])
+    await models.engine.dispose()
+    await models.read_engine.dispose()
+
+
+def serve(workers: int, port: int, redis_url: str | None) -> subprocess.Popen:
+    env = dict(os.environ, MAX_WORKERS=str(workers))
+    if redis_url is not None:
+        env["REDIS_URL"] = redis_url
+    # stdout would be the statements the engines echo
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                             "--workers", str(workers), "--log-level", "warning"],
+                            cwd=BACKEND, env=env, stdout=subprocess.DEVNULL)
+
+
+def fresh(base_url: str, token: str | None = None) -> httpx.AsyncClient:
+    """a client that connects anew for every request"""
+    headers = {} if token is None else {"Authorization": f"Bearer {token}"}
+    return httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30,
+                             limits=httpx.Limits(max_keepalive_connections=0))
+
+
+async def log_in(client: httpx.AsyncClient) -> str:
+    res = (await client.post("/login", json=ADMIN)).json()
+    assert res["ok"], res
+    return res["obj"]
+
+
+async def started(base_url: str, server: subprocess.Popen) -> str:
+    """waits until the workers answer and returns an admin token"""
+    deadline = time.monotonic() + 60
+    async with fresh(base_url) as client:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {server.returncode}")
+            try:
+                return await log_in(client)
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+async def load(base_url: str, token: str, seconds: float, readers: int, writers: int):
+    reads = writes = 0
+    errors = []
+    stop = time.monotonic() + seconds
+
+    async def read(client: httpx.AsyncClient):
+        nonlocal reads
+        while time.monotonic() < stop:
+            url = "/get_fields" if random.random() < 0.1 else f"/get_event_by_id/{random.randint(1, EVENTS)}"
+            res = await client.get(url)
+            if res.status_code != 200:
+                errors.append(f"GET {url}: {res.status_code}")
+            reads += 1
+
+    async def write(client: httpx.AsyncClient):
+        nonlocal writes
+        while time.monotonic() < stop:
+            operation_id = random.randint(1, EVENTS * OPERATIONS)
+            res = await client.post(f"/update_operation_parameters/{operation_id}",
+                                    json={"actualTime": random.randint(1, 24)})
+            if res.status_code != 200 or not res.json()["ok"]:
+                errors.append(f"update {operation_id}: {res.status_code} {res.text[:200]}")
+            writes += 1
+
+    # a connection per task, spread over the workers as they accept them
+    async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"}, timeout=30,
+                                 limits=httpx.Limits(max_connections=readers + writers)) as client:
+        await asyncio.gather(*(read(client) for _ in range(readers)), *(write(client) for _ in range(writers)))
+    return reads, writes, errors
+
+
+async def check_updates(base_url: str, token: str) -> list[str]:
+    errors = []
+    async with fresh(base_url, token) as client:
+        for _ in range(3):
+            value = random.randint(1000, 10 ** 9)
+            assert (await client.post("/update_operation_parameters/1", json={"actualTime": value})).json()["ok"]
+            for _ in range(CHECKS):
+                event = (await client.get("/get_event_by_id/1")).json()["obj"]
+                seen = next(op["parameters"]["actualTime"] for op in event["operations"] if op["id"] == 1)
+                if seen != value:
+                    errors.append(f"stale event after an update: actualTime {seen}, expected {value}")
+    return errors
+
+
+async def check_logout(base_url: str) -> list[str]:
+    errors = []
+    async with fresh(base_url) as client:
+        token = await log_in(client)
+        client.headers["Authorization"] = f"Bearer {token}"
+        # so every worker has the token decoded and its user cached
+        for _ in range(CHECKS):
+            assert (await client.get("/get_fields")).status_code == 200
+        assert (await client.post("/logout")).json()["ok"]
+        for _ in range(CHECKS):
+            status = (await client.get("/get_fields")).status_code
+            if status == 200:
+                errors.append("a logged out token was accepted")
+    return errors
+
+
+async def check_job(base_url: str, token: str) -> list[str]:
+    async with fresh(base_url, token) as client:
+        job = (await client.post("/jobs/export", json={"kind": "event", "target": "1"})).json()
+        deadline = time.monotonic() + 60
+        while job["status"] not in ("done", "failed"):
+            if time.monotonic() > deadline:
+                return [f"export job {job['id']} still {job['status']}"]
+            await asyncio.sleep(0.1)
+            res = await client.get(f"/jobs/{job['id']}")
+            if res.status_code != 200:
+                return [f"export job {job['id']}: {res.status_code} {res.text[:200]}"]
+            job = res.json()
+        if job["status"] != "done":
+            return [f"export job failed: {job['error']}"]
+        errors = []
+        for _ in range(CHECKS):
+            res = await client.get(f"/jobs/{job['id']}/result")
+            if res.status_code != 200 or not res.content.startswith(b"PK"):
+                errors.append(f"export job result: {res.status_code}")
+    return errors
+
+
+async def run(args, workers: int, port: int) -> list[str]:
+    base_url = f"http://127.0.0.1:{port}"
+    server = serve(workers, port, args.redis_url)
+    try:
+        token = await started(base_url, server)
+        reads, writes, errors = await load(base_url, token, args.seconds, args.readers, args.writers)
+        print(f"{workers} workers  {reads / args.seconds:9.1f} reads/s  {writes / args.seconds:8.1f} writes/s  "
+              f"{len(errors)} failed requests")
+        errors += await check_updates(base_url, token)
+        errors += await check_logout(base_url)
+        errors += await check_job(base_url, token)
+        return errors
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=32, help="concurrent reading clients")
+    parser.add_argument("--writers", type=int, default=4, help="concurrent writing clients")
+    parser.add_argument("--redis-url", help="e.g. redis://localhost:6379/0")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    if max(args.workers) > 1 and args.redis_url is None:
+        parser.error("more than one worker needs --redis-url")
+    asyncio.run(seed())
+    print(f"database {DB_FILE}")
+    failed = []
+    for workers in args.workers:
+        errors = asyncio.run(run(args, workers, args.port))
+        for error in errors[:5]:
+            print(f"    {error}")
+        failed += errors
+    sys.exit(1 if failed else 0)
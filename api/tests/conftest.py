@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+# the backend is configured from the environment at import time
+DB_FILE = os.path.join(tempfile.mkdtemp(), "api.db")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{DB_FILE}"
+os.environ.setdefault("SECRET_KEY_JWT", "test")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "backend"))
+
+import pytest
+from sqlalchemy import event
+import crud
+import models
+import schemas
+
+FIELDS = 2
+BUSHES = 2
+WELLS = 2
+EVENTS = 2
+OPERATIONS = 5
+
+
+def run(fn, *args):
+    """runs fn(*args) in a fresh event loop, the engines' pools are bound to the loop they were used in"""
+    async def main():
+        try:
+            return await fn(*args)
+        finally:
+            await models.engine.dispose()
+            await models.read_engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def _seed():
+    await models.init_engine()
+    async with models.async_session() as session:
+        await crud.create_user(session, schemas.User(
+            username="admin", password="admin", first_name="", last_name="", middle_name="", is_admin=True))
+        for f in range(FIELDS):
+            await crud.create_field(session, schemas.FieldBase(name=f"F{f}"))
+            for b in range(BUSHES):
+                bush = await crud.create_bush(session, schemas.BushCreate(name=f"B{b}", field_name=f"F{f}"))
+                for w in range(WELLS):
+                    well = await crud.create_well(session, schemas.WellCreate(
+                        name=f"W{w}", parameters={"x": str(w)}, bush_id=bush.id))
+                    for e in range(EVENTS):
+                        ev = await crud.create_event(session, schemas.EventCreate(
+                            name=f"E{e}", description="", well_id=well.id))
+                        await crud.create_operations(session, [schemas.OperationCreate(
+                            name=f"Бурение %x% {o}", is_complete=False, event_id=ev.id,
+                            parameters={"plannedTime": 2, "actualTime": 3, "plannedDepth": 10 * o, "actualDepth": 11 * o},
+                        ) for o in range(OPERATIONS)])
+        await crud.create_example_operation(session, schemas.ExampleOperationCreate(name="Бурение", parameters={}))
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    """a database brought up by the migrations, with FIELDS x BUSHES x WELLS x EVENTS x OPERATIONS of the hierarchy"""
+    run(_seed)
+
+
+@pytest.fixture
+def statements():
+    """(statement, parameters, row width) of everything the engines execute during the test"""
+    executed = []
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters, len(cursor.description or ())))
+
+    engines = (models.engine.sync_engine, models.read_engine.sync_engine)
+    for engine in engines:
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    yield executed
+    for engine in engines:
+        event.remove(engine, "after_cursor_execute", after_cursor_execute)
+
+
+@pytest.fixture
+def client(seeded):
+    """a TestClient logged in as admin"""
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as client:
+        token = client.post("/login", json={"login": "admin", "password": "admin"}).json()["obj"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+        # the pools are bound to the client's event loop
+        client.portal.call(models.engine.dispose)
+        client.portal.call(models.read_engine.dispose)
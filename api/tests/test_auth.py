@@ -0,0 +1,36 @@
+import security
+
+ADMIN_ONLY = "/metrics/write_batches"
+
+
+def worker_state():
+    return security.auth_version, set(security.revoked_tokens), dict(security.cached_users)
+
+
+def another_worker(state):
+    """puts back what this process knew before, as a worker that never saw the change would"""
+    security.auth_version, security.revoked_tokens, security.cached_users = state
+
+
+def test_logout_revokes_the_token_in_every_worker(client):
+    token = client.post("/login", json={"login": "admin", "password": "admin"}).json()["obj"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get(ADMIN_ONLY, headers=headers).status_code == 200
+    before = worker_state()
+    assert client.post("/logout", headers=headers).json()["ok"]
+    another_worker(before)
+    assert client.get(ADMIN_ONLY, headers=headers).status_code == 403
+    # the client's own token is still good
+    assert client.get(ADMIN_ONLY).status_code == 200
+
+
+def test_changed_user_is_reloaded_in_every_worker(client):
+    assert client.get(ADMIN_ONLY).status_code == 200
+    before = worker_state()
+    until, version, admin = before[2]["admin"]
+    # as if this worker had cached admin before an update took the role away and gave it back
+    before[2]["admin"] = (until, version, type(admin)(username="admin", password=admin.password, is_admin=False))
+    assert client.post("/add_user", json={"username": "other", "password": "x", "first_name": "", "last_name": "",
+                                          "middle_name": "", "is_admin": False}).json()["ok"]
+    another_worker(before)
+    assert client.get(ADMIN_ONLY).status_code == 200
@@ -0,0 +1,40 @@
+import batching
+import cache
+import crud
+from conftest import run
+
+
+class StrictBackend(cache.LRUCache):
+    """fails on an empty delete the way Redis fails on a bare DEL"""
+
+    async def delete(self, *keys: str):
+        assert keys, "wrong number of arguments for 'del' command"
+        await super().delete(*keys)
+
+
+async def submit_all(*writes) -> tuple[list, batching.Metrics]:
+    batcher = batching.WriteBatcher(0.01, 10)
+    await batcher.start()
+    try:
+        results = [await batcher.submit(stage, *args) for stage, args in writes]
+    finally:
+        await batcher.stop()
+    return results, batcher.metrics
+
+
+def test_batch_of_unknown_ids(seeded, monkeypatch):
+    monkeypatch.setattr(cache, "backend", StrictBackend(10, 10))
+    results, metrics = run(submit_all, (crud.stage_parameters_of_operation, (10 ** 6, {"plannedTime": 1})))
+    assert results == [None]
+    assert metrics.failed_writes == 0
+
+
+def test_failed_invalidation_keeps_committed_writes(seeded, monkeypatch):
+    async def unavailable(db):
+        raise ConnectionError("cache is down")
+
+    monkeypatch.setattr(crud, "invalidate_stale", unavailable)
+    [operation], metrics = run(submit_all, (crud.stage_parameters_of_operation, (20, {"plannedNpt": 1})))
+    assert operation.parameters["plannedNpt"] == 1
+    assert metrics.failed_writes == 0
+    assert metrics.failed_invalidations == 1
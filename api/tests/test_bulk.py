@@ -0,0 +1,21 @@
+def test_bulk_ids_follow_the_submitted_rows(client):
+    wells = client.post("/bulk/create_wells", json=[
+        {"name": f"Bulk {w}", "parameters": {}, "bush_id": 1} for w in range(3)
+    ]).json()["obj"]
+    events = client.post("/bulk/create_events", json=[
+        {"name": f"Bulk {e}", "description": "", "well_id": well_id} for e, well_id in enumerate(wells)
+    ]).json()["obj"]
+    operations = client.post("/bulk/create_operations", json=[
+        {"name": f"Bulk {e}.{o}", "parameters": {"plannedTime": o}, "is_complete": False, "event_id": event_id}
+        for o in range(4) for e, event_id in enumerate(events)
+    ]).json()["obj"]
+
+    tree = client.get("/bushes/1/wells", params={"depth": 2}).json()["items"]
+    names = {well["id"]: well["name"] for well in tree}
+    assert [names[well_id] for well_id in wells] == [f"Bulk {w}" for w in range(3)]
+    for e, event_id in enumerate(events):
+        event = client.get(f"/get_event_by_id/{event_id}").json()["obj"]
+        assert event["name"] == f"Bulk {e}"
+        # submitted interleaved with the other events, appended to this one in the order given
+        assert [operation["name"] for operation in event["operations"]] == [f"Bulk {e}.{o}" for o in range(4)]
+        assert [operation["id"] for operation in event["operations"]] == operations[e::len(events)]
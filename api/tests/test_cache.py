@@ -0,0 +1,49 @@
+def create_event(client) -> tuple[int, int]:
+    """an event of its own with one operation"""
+    event_id = client.post("/create_event", json={"name": "Cached", "description": "", "well_id": 1}).json()["obj"]
+    operation_id = client.post("/create_operation", json={
+        "name": "op", "parameters": {"plannedTime": 2, "actualTime": 3, "plannedDepth": 1, "actualDepth": 1},
+        "is_complete": False, "event_id": event_id,
+    }).json()["obj"]
+    return event_id, operation_id
+
+
+def test_cached_reads_are_served_without_the_database(client, statements):
+    event_id, _ = create_event(client)
+    for url in ("/get_fields", f"/get_event_by_id/{event_id}", f"/get_dots/{event_id}"):
+        first = client.get(url)
+        statements.clear()
+        assert client.get(url).content == first.content
+        assert statements == []
+
+
+def test_writes_invalidate_what_they_change(client):
+    event_id, operation_id = create_event(client)
+
+    def operation():
+        return client.get(f"/get_event_by_id/{event_id}").json()["obj"]["operations"][-1]
+
+    def events_in_fields():
+        return [event["id"] for field in client.get("/get_fields").json() for bush in field["bushes"]
+                for well in bush["wells"] for event in well["events"]]
+
+    dots = client.get(f"/get_dots/{event_id}").json()
+    assert operation()["parameters"]["actualTime"] == 3 and event_id in events_in_fields()
+
+    assert client.post(f"/update_operation_parameters/{operation_id}", json={"actualTime": 7}).json()["ok"]
+    assert operation()["parameters"]["actualTime"] == 7
+    assert client.get(f"/get_dots/{event_id}").json() != dots
+    assert client.patch(f"/operations/{operation_id}/parameters", json={"actualTime": 9}).status_code == 200
+    assert operation()["parameters"]["actualTime"] == 9
+
+    second = client.post("/create_operation", json={
+        "name": "second", "parameters": {"plannedTime": 1}, "is_complete": False, "event_id": event_id,
+    }).json()["obj"]
+    assert operation()["id"] == second
+    assert client.post("/update_operation_order", params={"event_id": event_id}, json=[1, 0]).json()["ok"]
+    assert operation()["id"] == operation_id
+    assert client.post(f"/delete_operation/{operation_id}").json()
+    assert operation()["id"] == second
+
+    new_event = client.post("/create_event", json={"name": "Cached", "description": "", "well_id": 1}).json()["obj"]
+    assert new_event in events_in_fields()
@@ -0,0 +1,17 @@
+import exports
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def test_json_is_gzipped(client):
+    res = client.get("/dots", params={"field_name": "F0"}, headers=GZIP)
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+
+
+def test_xlsx_is_passed_through(client):
+    res = client.get("/export_event/1.xlsx", headers=GZIP)
+    assert res.status_code == 200
+    assert res.headers["content-type"] == exports.XLSX_MEDIA_TYPE
+    assert "content-encoding" not in res.headers
+    assert res.content[:2] == b"PK"
@@ -0,0 +1,43 @@
+import json
+import crud
+import models
+import schemas
+import utils
+from conftest import run
+
+
+async def event_without_depths() -> int:
+    """an event whose operations have only times, which OperationCreate accepts"""
+    async with models.async_session() as db:
+        event = await crud.create_event(db, schemas.EventCreate(name="no depths", description="", well_id=1))
+        await crud.create_operations(db, [schemas.OperationCreate(
+            name="n", parameters={"plannedTime": 1, "actualTime": "2"}, is_complete=False, event_id=event.id,
+        ), schemas.OperationCreate(
+            name="n", parameters={"plannedTime": 1, "actualDepth": "abc"}, is_complete=False, event_id=event.id,
+        )])
+        return event.id
+
+
+def test_missing_depths_count_as_zero(seeded):
+    async def dots():
+        event_id = await event_without_depths()
+        async with models.read_session() as db:
+            return await utils.get_dots(db, event_id)
+
+    res = run(dots)
+    assert res.planned == [(1 / 24, 0.0), (2 / 24, 0.0)]
+    assert res.actual == [(2 / 24, 0.0), (2 / 24, 0.0)]
+    json.dumps(res.dict(), allow_nan=False)
+
+
+def test_missing_depths_of_scope_count_as_zero(seeded):
+    async def dots():
+        event_id = await event_without_depths()
+        async with models.read_session() as db:
+            return event_id, await utils.get_dots_of_scope(db, well_id=1)
+
+    event_id, res = run(dots)
+    [event_dots] = [dots for dots in res if dots.event_id == event_id]
+    assert event_dots.planned == [(1 / 24, 0.0), (2 / 24, 0.0)]
+    assert event_dots.actual == [(2 / 24, 0.0), (2 / 24, 0.0)]
+    json.dumps([dots.dict() for dots in res], allow_nan=False)
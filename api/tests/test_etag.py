@@ -0,0 +1,29 @@
+PLAIN = {"Accept-Encoding": "identity"}
+
+
+def test_unchanged_reads_are_not_modified(client, statements):
+    event_id = client.post("/create_event", json={"name": "ETag", "description": "", "well_id": 1}).json()["obj"]
+    for url in ("/get_fields", f"/get_event_by_id/{event_id}", f"/get_dots/{event_id}"):
+        gzipped, plain = client.get(url), client.get(url, headers=PLAIN)
+        assert gzipped.headers["ETag"] == plain.headers["ETag"].removesuffix('"') + '-gzip"'
+        statements.clear()
+        for etag, headers in ((gzipped.headers["ETag"], {}), (plain.headers["ETag"], PLAIN)):
+            res = client.get(url, headers=headers | {"If-None-Match": f'"other", {etag}'})
+            assert res.status_code == 304 and res.content == b""
+            assert res.headers["ETag"] == etag
+        # neither the graph nor the body is touched
+        assert statements == []
+
+
+def test_a_write_changes_the_etag(client):
+    event_id = client.post("/create_event", json={"name": "ETag", "description": "", "well_id": 1}).json()["obj"]
+    url = f"/get_event_by_id/{event_id}"
+    etag = client.get(url).headers["ETag"]
+    client.post("/create_operation", json={
+        "name": "op", "parameters": {"plannedTime": 1}, "is_complete": False, "event_id": event_id,
+    })
+    res = client.get(url, headers={"If-None-Match": etag})
+    assert res.status_code == 200 and res.headers["ETag"] != etag
+    assert [operation["name"] for operation in res.json()["obj"]["operations"]] == ["op"]
+    # the stale tag of the plain representation doesn't match either
+    assert client.get(url, headers=PLAIN | {"If-None-Match": etag.removesuffix('-gzip"') + '"'}).status_code == 200
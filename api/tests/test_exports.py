@@ -0,0 +1,76 @@
+import asyncio
+import io
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import openpyxl
+import crud
+import exports
+import models
+import schemas
+from conftest import run
+
+
+async def export_bush() -> tuple[int, int]:
+    """a bush of its own, the operations other tests add may lack the parameters of a report"""
+    async with models.async_session() as session:
+        bush = await crud.create_bush(session, schemas.BushCreate(name="Export", field_name="F0"))
+        well = await crud.create_well(session, schemas.WellCreate(name="W", parameters={}, bush_id=bush.id))
+        for e in range(2):
+            event = await crud.create_event(session, schemas.EventCreate(name=f"E{e}", description="", well_id=well.id))
+            await crud.create_operations(session, [schemas.OperationCreate(
+                name=f"op {o}", is_complete=False, event_id=event.id,
+                parameters={"plannedTime": 2, "actualTime": 3, "plannedDepth": 10 * o, "actualDepth": 11 * o},
+            ) for o in range(50)])
+        return bush.id, event.id
+
+
+def values(content: bytes) -> dict[str, list[tuple]]:
+    wb = openpyxl.load_workbook(io.BytesIO(content))
+    return {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb.worksheets}
+
+
+def test_streamed_workbooks_match_the_stored_ones(seeded, monkeypatch):
+    # the app's executor is shut down by the client tests
+    monkeypatch.setattr(exports, "executor", ProcessPoolExecutor(max_workers=1))
+
+    async def export():
+        bush_id, event_id = await export_bush()
+        res = []
+        async with models.read_session() as session:
+            for make_writer, target in ((exports.event_writer, event_id), (exports.bush_writer, bush_id)):
+                streamed = b"".join([chunk async for chunk in exports.stream(await make_writer(session, target))])
+                stored = await exports.to_bytes(await make_writer(session, target))
+                res.append((streamed, stored))
+        return res
+
+    try:
+        res = run(export)
+    finally:
+        exports.executor.shutdown()
+    for streamed, stored in res:
+        assert values(streamed) == values(stored)
+
+
+def test_writer_stops_when_the_reader_does():
+    stopped = threading.Event()
+    written = 0
+
+    def writer(out):
+        nonlocal written
+        try:
+            while True:
+                out.write(b"x" * exports.CHUNK_SIZE)
+                written += 1
+        finally:
+            stopped.set()
+
+    async def read_two_chunks():
+        chunks = exports.stream(writer)
+        assert len(await anext(chunks)) == exports.CHUNK_SIZE
+        await anext(chunks)
+        await chunks.aclose()
+        return await asyncio.get_running_loop().run_in_executor(None, stopped.wait, 5)
+
+    assert asyncio.run(read_two_chunks())
+    # no more than the chunks allowed to wait were written ahead of the reader
+    assert written <= 2 + exports.CHUNKS_AHEAD + 1
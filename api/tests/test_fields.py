@@ -0,0 +1,53 @@
+import json
+import cache
+import crud
+import models
+import schemas
+import utils
+from conftest import run
+
+
+async def grow_tree():
+    """fields created out of name order, each with several bushes, wells and events"""
+    async with models.async_session() as session:
+        for field_name in ("Zeta", "Alpha"):
+            await crud.create_field(session, schemas.FieldBase(name=field_name))
+            for b in range(2):
+                bush = await crud.create_bush(session, schemas.BushCreate(name=f"B{b}", field_name=field_name))
+                for w in range(2):
+                    well = await crud.create_well(session, schemas.WellCreate(name=f"W{w}", parameters={}, bush_id=bush.id))
+                    for e in range(2):
+                        event = await crud.create_event(session, schemas.EventCreate(
+                            name=f"E{e}", description="", well_id=well.id))
+                        await crud.create_operations(session, [schemas.OperationCreate(
+                            name=f"op {o}", is_complete=False, event_id=event.id,
+                            parameters={"plannedTime": 1, "actualTime": 2, "plannedDepth": o, "actualDepth": o},
+                        ) for o in range(3)])
+        # so that the operations of the last event aren't in the order of their ids
+        await crud.update_operation_order_for_event(session, event.id, [2, 1, 0])
+
+
+def test_orm_and_record_trees_are_in_the_same_order(seeded):
+    async def bodies():
+        await grow_tree()
+        async with models.read_session() as session:
+            orm = cache.encode([schemas.Field.from_orm(field) for field in await crud.get_fields(session)])
+            records = cache.encode_records(await utils.get_fields_records(session))
+        return json.loads(orm), json.loads(records)
+
+    orm, records = run(bodies)
+    assert orm == records
+    names = [field["name"] for field in orm]
+    assert names == sorted(names) and {"Alpha", "Zeta"} <= set(names)
+    for field in orm:
+        assert [bush["id"] for bush in field["bushes"]] == sorted(bush["id"] for bush in field["bushes"])
+        for bush in field["bushes"]:
+            assert [well["id"] for well in bush["wells"]] == sorted(well["id"] for well in bush["wells"])
+            for well in bush["wells"]:
+                assert [event["id"] for event in well["events"]] == sorted(event["id"] for event in well["events"])
+                for event in well["events"]:
+                    orders = [operation["order"] for operation in event["operations"]]
+                    assert orders == sorted(orders)
+    alpha = next(field for field in orm if field["name"] == "Alpha")
+    reordered = alpha["bushes"][-1]["wells"][-1]["events"][-1]["operations"]
+    assert [operation["name"] for operation in reordered] == ["op 2", "op 1", "op 0"]
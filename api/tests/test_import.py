@@ -0,0 +1,57 @@
+import io
+import openpyxl
+import exports
+from excel.importer import FIRST_ROW, NAME_COLUMN, PARAMETER_COLUMNS
+
+
+def create_event(client, operations: list[dict]) -> int:
+    event_id = client.post("/create_event", json={"name": "Import", "description": "", "well_id": 1}).json()["obj"]
+    client.post("/bulk/create_operations", json=[
+        {"name": operation["name"], "parameters": operation["parameters"], "is_complete": False, "event_id": event_id}
+        for operation in operations
+    ])
+    return event_id
+
+
+def operations_of(client, event_id: int) -> list[tuple[str, dict]]:
+    event = client.get(f"/get_event_by_id/{event_id}").json()["obj"]
+    return [(operation["name"], operation["parameters"]) for operation in event["operations"]]
+
+
+def upload(client, event_id: int, content: bytes) -> dict:
+    return client.post(f"/import_operations/{event_id}", files={"file": ("plan.xlsx", content, exports.XLSX_MEDIA_TYPE)}).json()
+
+
+def test_exported_plan_is_imported_back(client):
+    planned = [{"name": f"Промывка {o}", "parameters": {
+        "plannedTime": 2 + o, "plannedDepth": 100 * o, "actualTime": 3, "actualDepth": 110 * o,
+        "plannedNpt": 0.5, "nptComment": "ожидание", "actualIlt": 1, "iltComment": "ремонт",
+    }} for o in range(3)]
+    source = create_event(client, planned)
+    workbook = client.get(f"/export_event/{source}.xlsx").content
+    target = create_event(client, [])
+
+    res = upload(client, target, workbook)
+    assert res == {"ok": True, "obj": 3}
+    assert operations_of(client, target) == [(operation["name"], operation["parameters"]) for operation in planned]
+
+
+def test_malformed_workbooks_are_rejected_whole(client):
+    target = create_event(client, [])
+    res = upload(client, target, b"not a workbook")
+    assert not res["ok"] and res["obj"] == "Файл не является книгой Excel"
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    columns = {parameter: column for column, parameter in PARAMETER_COLUMNS.items()}
+    for row, times in ((FIRST_ROW, (1, 10, 2, 11)), (FIRST_ROW + 1, (1, None, 2, None))):
+        ws.cell(row, NAME_COLUMN + 1, f"op {row}")
+        for parameter, value in zip(("plannedTime", "plannedDepth", "actualTime", "actualDepth"), times):
+            ws.cell(row, columns[parameter] + 1, value)
+    content = io.BytesIO()
+    wb.save(content)
+
+    res = upload(client, target, content.getvalue())
+    assert not res["ok"] and res["obj"] == f"Строка {FIRST_ROW + 1}: не заполнены plannedDepth, actualDepth"
+    # the valid row before it isn't imported either
+    assert operations_of(client, target) == []
@@ -0,0 +1,123 @@
+import sqlite3
+import pytest
+import crud
+import models
+import schemas
+from conftest import DB_FILE, run
+
+TABLES = {table.name for table in models.Base.metadata.sorted_tables}
+
+# (crud call, tables it may read in full because it returns all of them)
+READS = {
+    "get_user_by_username": (lambda db: crud.get_user_by_username(db, "admin"), ()),
+    "get_fields": (crud.get_fields, ("Fields",)),
+    "get_fields_page": (lambda db: crud.get_fields_page(db, "F0", 10, 4), ()),
+    "get_field_by_name": (lambda db: crud.get_field_by_name(db, "F0"), ()),
+    "get_bush_by_id": (lambda db: crud.get_bush_by_id(db, 1), ()),
+    "get_bushes_page": (lambda db: crud.get_bushes_page(db, "F0", 1, 10, 3), ()),
+    "get_well_by_id": (lambda db: crud.get_well_by_id(db, 1), ()),
+    "get_wells_page": (lambda db: crud.get_wells_page(db, 1, 1, 10, 2), ()),
+    "get_event_by_id": (lambda db: crud.get_event_by_id(db, 1), ()),
+    "get_event_rows": (lambda db: crud.get_event_rows(db, 1), ()),
+    "get_events_page": (lambda db: crud.get_events_page(db, 1, 1, 10, 1), ()),
+    "get_events_of_bush": (lambda db: crud.get_events_of_bush(db, 1), ()),
+    "get_events_of_field": (lambda db: crud.get_events_of_field(db, "F0"), ()),
+    "get_curve_columns": (lambda db: crud.get_curve_columns(db, 1), ()),
+    "get_curve_columns_of_well": (lambda db: crud.get_curve_columns_of_scope(db, well_id=1), ()),
+    "get_curve_columns_of_bush": (lambda db: crud.get_curve_columns_of_scope(db, bush_id=1), ()),
+    "get_curve_columns_of_field": (lambda db: crud.get_curve_columns_of_scope(db, field_name="F0"), ()),
+    "get_operation_by_id": (lambda db: crud.get_operation_by_id(db, 1), ()),
+    "get_operations_page": (lambda db: crud.get_operations_page(db, 1, 0, 10), ()),
+    "search_operations_of_event": (lambda db: crud.search_operations(db, schemas.OperationSearch(
+        event_id=1, filters=[{"key": "plannedTime", "op": "exists"}]), None, 10), ()),
+    "search_operations_by_range": (lambda db: crud.search_operations(db, schemas.OperationSearch(
+        filters=[{"key": "plannedDepth", "op": "gt", "value": 5}]), "10.0:2", 10), ()),
+    "search_operations_behind": (lambda db: crud.search_operations(db, schemas.OperationSearch(
+        filters=[{"key": "behindTime", "op": "ge", "value": 0.5}]), None, 10), ()),
+    "search_wells_of_bush": (lambda db: crud.search_wells(db, schemas.WellSearch(
+        bush_id=1, filters=[{"key": "x", "value": "1"}]), None, 10), ()),
+    "get_example_operation_by_id": (lambda db: crud.get_example_operation_by_id(db, 1), ()),
+    "get_example_operations_by_name": (lambda db: crud.get_example_operations_by_name(db, "Бурение"), ()),
+    "search_names": (lambda db: crud.search_names(db, "бур", 10), ()),
+}
+
+# writes run on the writer with commits turned into flushes and are rolled back afterwards
+WRITES = {
+    "stage_parameters_of_well": lambda db: crud.stage_parameters_of_well(db, 2, {"x": "2"}),
+    "stage_parameters_of_operation": lambda db: crud.stage_parameters_of_operation(db, 7, {"plannedTime": 5}),
+    "patch_parameters_of_well": lambda db: crud.patch_parameters_of_well(db, 2, {"y": 1}, None),
+    "patch_parameters_of_operation": lambda db: crud.patch_parameters_of_operation(db, 7, {"actualTime": 1}, None),
+    "update_operation_order_for_event": lambda db: crud.update_operation_order_for_event(db, 2, [4, 3, 2, 1, 0]),
+    "create_operation": lambda db: crud.create_operation(db, schemas.OperationCreate(
+        name="n", parameters={"plannedTime": 1}, is_complete=False, event_id=2)),
+    "move_operation": lambda db: crud.move_operation(db, 11, 12, None),
+    "delete_operation": lambda db: crud.delete_operation(db, 13),
+    "rebalance_event_order": lambda db: crud.rebalance_event_order(db, 3),
+}
+
+
+def explain(statement: str, parameters) -> list[str]:
+    if isinstance(parameters, list):
+        # executemany, every row runs the same plan
+        parameters = parameters[0]
+    with sqlite3.connect(DB_FILE) as conn:
+        return [detail for *_, detail in conn.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+def full_scans(statement: str, parameters) -> set[str]:
+    """tables the plan of the statement reads in full instead of searching an index"""
+    scans = set()
+    for detail in explain(statement, parameters):
+        words = detail.split()
+        if words[0] == "SCAN" and words[1] in TABLES and "INDEX" not in detail:
+            scans.add(words[1])
+    return scans
+
+
+def assert_indexed(executed: list, allowed=()):
+    checked = 0
+    for statement, parameters, _ in executed:
+        if statement.lstrip().split()[0].upper() not in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            continue
+        checked += 1
+        assert full_scans(statement, parameters) <= set(allowed), statement
+    assert checked
+
+
+@pytest.mark.parametrize("name", READS)
+def test_read_uses_indexes(seeded, statements, name):
+    call, allowed = READS[name]
+
+    async def read():
+        async with models.read_session() as db:
+            res = await call(db)
+            if hasattr(res, "all"):
+                res.all()
+
+    run(read)
+    assert_indexed(statements, allowed)
+
+
+@pytest.mark.parametrize("name", WRITES)
+def test_write_uses_indexes(seeded, statements, name, monkeypatch):
+    async def write():
+        async with models.async_session() as db:
+            monkeypatch.setattr(db, "commit", db.flush)
+            await WRITES[name](db)
+            await db.rollback()
+
+    run(write)
+    assert_indexed(statements)
+
+
+@pytest.mark.parametrize("name", ["search_operations_by_range", "search_operations_behind"])
+def test_range_search_pages_in_index_order(seeded, statements, name):
+    call, _ = READS[name]
+
+    async def read():
+        async with models.read_session() as db:
+            await call(db)
+
+    run(read)
+    [(statement, parameters, _)] = statements
+    assert not [detail for detail in explain(statement, parameters) if "TEMP B-TREE" in detail]
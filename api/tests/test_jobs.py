@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import delete
+import jobs
+import models
+import schemas
+from conftest import run
+
+
+async def clear_jobs():
+    async with models.async_session() as session:
+        await session.execute(delete(models.ExportJob))
+        await session.commit()
+
+
+@pytest.fixture
+def no_jobs(seeded):
+    run(clear_jobs)
+    yield
+    run(clear_jobs)
+
+
+async def finished(queue: jobs.JobQueue, job_id: str) -> models.ExportJob:
+    while True:
+        job = await queue.get(job_id)
+        if job.status in (jobs.DONE, jobs.FAILED):
+            return job
+        await asyncio.sleep(0.01)
+
+
+def test_only_event_and_bush_targets_are_ids():
+    assert schemas.ExportJobCreate(kind="field", target="12").target == "12"
+    assert schemas.ExportJobCreate(kind="event", target=12).target == "12"
+    with pytest.raises(ValidationError):
+        schemas.ExportJobCreate(kind="bush", target="F0")
+
+
+def test_submit_rejects_a_full_queue(no_jobs):
+    async def submit():
+        queue = jobs.JobQueue(0, 1024, 10, 2)
+        first = await queue.submit(schemas.ExportJobCreate(kind="event", target="1"))
+        # an identical request joins the waiting job instead of taking a slot
+        assert (await queue.submit(schemas.ExportJobCreate(kind="event", target="1"))).id == first.id
+        await queue.submit(schemas.ExportJobCreate(kind="event", target="2"))
+        with pytest.raises(asyncio.QueueFull):
+            await queue.submit(schemas.ExportJobCreate(kind="event", target="3"))
+
+    run(submit)
+
+
+def test_jobs_are_shared_between_workers(no_jobs):
+    async def export():
+        # connects the engines as startup does, before the tasks below connect concurrently
+        await models.init_engine()
+        # two queues stand for two worker processes: one takes the request, the other runs it
+        submitting, running = jobs.JobQueue(0, 1 << 20, 10, 10), jobs.JobQueue(1, 1 << 20, 10, 10)
+        job = await submitting.submit(schemas.ExportJobCreate(kind="event", target="1"))
+        await running.start()
+        try:
+            job = await finished(submitting, job.id)
+        finally:
+            await running.stop()
+        return job, await submitting.get_result(job.id)
+
+    job, result = run(export)
+    assert job.status == jobs.DONE and job.progress == 1.0
+    assert result.startswith(b"PK")
+    assert job.size == len(result)
+
+
+def test_oversized_result_fails(no_jobs):
+    async def export():
+        await models.init_engine()
+        queue = jobs.JobQueue(1, 10, 10, 10)
+        await queue.start()
+        try:
+            job = await queue.submit(schemas.ExportJobCreate(kind="event", target="1"))
+            job = await finished(queue, job.id)
+        finally:
+            await queue.stop()
+        return job, await queue.get_result(job.id)
+
+    job, result = run(export)
+    assert job.status == jobs.FAILED
+    assert result is None and job.size == 0
+
+
+def test_oldest_results_are_evicted(no_jobs):
+    async def export():
+        await models.init_engine()
+        queue = jobs.JobQueue(1, 1 << 20, 2, 10)
+        await queue.start()
+        try:
+            ids = []
+            for event_id in ("1", "2", "3"):
+                job = await queue.submit(schemas.ExportJobCreate(kind="event", target=event_id))
+                ids.append((await finished(queue, job.id)).id)
+        finally:
+            await queue.stop()
+        return [await queue.get(job_id) for job_id in ids]
+
+    oldest, *newest = run(export)
+    assert oldest is None
+    assert all(job.status == jobs.DONE for job in newest)
+
+
+def test_full_queue_is_unavailable(client, no_jobs, monkeypatch):
+    monkeypatch.setattr(jobs.queue, "max_queued", 0)
+    assert client.post("/jobs/export", json={"kind": "bush", "target": "F0"}).status_code == 422
+    assert client.post("/jobs/export", json={"kind": "field", "target": "F0"}).status_code == 503
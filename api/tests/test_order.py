@@ -0,0 +1,83 @@
+import pytest
+import crud
+import models
+import schemas
+from conftest import run
+
+# (plannedTime, actualTime) of the operations of every event created here
+TIMES = [(1, 2), (5, 3), (2, 8), (7, 1), (4, 4)]
+
+
+async def create_event() -> tuple[int, list[int]]:
+    """an event of its own with operations of different times, and the ids of its operations in order"""
+    async with models.async_session() as session:
+        event = await crud.create_event(session, schemas.EventCreate(name="Order", description="", well_id=1))
+        ids = await crud.create_operations(session, [schemas.OperationCreate(
+            name=f"op {o}", is_complete=False, event_id=event.id,
+            parameters={"plannedTime": planned, "actualTime": actual, "plannedDepth": o, "actualDepth": o},
+        ) for o, (planned, actual) in enumerate(TIMES)])
+        return event.id, ids
+
+
+async def stored(event_id: int) -> list[tuple]:
+    """(id, order, planned_days, actual_days) of the operations of the event in order, read afresh"""
+    async with models.read_session() as session:
+        event = await crud.get_event_by_id(session, event_id)
+        return [(op.id, op.order, op.planned_days, op.actual_days) for op in event.operations]
+
+
+def running_totals(ids: list[int], sequence: list[int]) -> list[tuple[float, float]]:
+    """the totals of the operations ids[i] for i in sequence, summed from scratch"""
+    planned = actual = 0.0
+    totals = []
+    for i in sequence:
+        planned += TIMES[i][0] / 24
+        actual += TIMES[i][1] / 24
+        totals.append((pytest.approx(planned), pytest.approx(actual)))
+    return totals
+
+
+def test_loaded_operations_see_the_totals_a_move_shifts(seeded):
+    async def move_in_one_session():
+        event_id, ids = await create_event()
+        async with models.async_session() as session:
+            loaded = list((await crud.get_event_by_id(session, event_id)).operations)
+            await crud.move_operation(session, ids[0], None, ids[-1])
+            seen = sorted((op.id, op.order, op.planned_days, op.actual_days) for op in loaded)
+        return seen, sorted(await stored(event_id))
+
+    seen, fresh = run(move_in_one_session)
+    assert seen == fresh
+
+
+def test_loaded_operation_sees_its_patched_parameters(seeded):
+    async def patch_in_one_session():
+        event_id, ids = await create_event()
+        async with models.async_session() as session:
+            loaded = await crud.get_operation_by_id(session, ids[0])
+            version, parameters = await crud.patch_parameters_of_operation(session, ids[0], {"actualTime": 9})
+            return (loaded.version, loaded.parameters), (version, parameters)
+
+    seen, patched = run(patch_in_one_session)
+    assert seen == patched and patched[1]["actualTime"] == 9
+
+
+def test_moves_and_rebalance_keep_sparse_orders_and_totals(seeded):
+    async def reorder():
+        event_id, ids = await create_event()
+        async with models.async_session() as session:
+            await crud.move_operation(session, ids[4], ids[0], None)
+            await crud.move_operation(session, ids[4], None, ids[2])
+            moved = await stored(event_id)
+            await crud.rebalance_event_order(session, event_id)
+        return ids, moved, await stored(event_id)
+
+    ids, moved, rebalanced = run(reorder)
+    sequence = [0, 1, 2, 4, 3]
+    for rows in (moved, rebalanced):
+        assert [row[0] for row in rows] == [ids[i] for i in sequence]
+        assert [(row[2], row[3]) for row in rows] == running_totals(ids, sequence)
+    # only the moved operation got a new key, between the keys of its neighbours
+    assert [row[1] for row in moved] == [0, crud.ORDER_STEP, 2 * crud.ORDER_STEP,
+                                         (2 * crud.ORDER_STEP + 3 * crud.ORDER_STEP) // 2, 3 * crud.ORDER_STEP]
+    assert [row[1] for row in rebalanced] == [position * crud.ORDER_STEP for position in range(len(TIMES))]
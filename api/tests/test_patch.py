@@ -0,0 +1,39 @@
+def create_operation(client) -> int:
+    event_id = client.post("/create_event", json={"name": "Patch", "description": "", "well_id": 1}).json()["obj"]
+    return client.post("/create_operation", json={
+        "name": "op", "parameters": {"plannedTime": 2, "actualTime": 3, "plannedDepth": 1, "actualDepth": 1},
+        "is_complete": False, "event_id": event_id,
+    }).json()["obj"]
+
+
+def test_if_match_rejects_a_stale_version(client):
+    url = f"/operations/{create_operation(client)}/parameters"
+    first = client.patch(url, json={"actualTime": 4})
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag == f'"{first.json()["version"]}"'
+
+    second = client.patch(url, json={"actualTime": 5, "plannedDepth": None}, headers={"If-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
+    assert second.json()["parameters"] == {"plannedTime": 2, "actualTime": 5, "actualDepth": 1}
+
+    # another client still holding the first version loses instead of overwriting
+    stale = client.patch(url, json={"actualTime": 6}, headers={"If-Match": etag})
+    assert stale.status_code == 409
+    current = client.patch(url, json={}, headers={"If-Match": second.headers["ETag"]})
+    assert current.status_code == 200 and current.json()["parameters"]["actualTime"] == 5
+
+
+def test_if_match_of_wells(client):
+    url = "/wells/1/parameters"
+    etag = client.patch(url, json={"patched": 1}).headers["ETag"]
+    assert client.patch(url, json={"patched": None}, headers={"If-Match": etag}).status_code == 200
+    assert client.patch(url, json={"patched": 2}, headers={"If-Match": etag}).status_code == 409
+
+
+def test_if_match_errors(client):
+    url = f"/operations/{create_operation(client)}/parameters"
+    assert client.patch(url, json={}, headers={"If-Match": "abc"}).status_code == 400
+    assert client.patch(url, json={}, headers={"If-Match": "*"}).status_code == 200
+    assert client.patch("/operations/1000000/parameters", json={}).status_code == 404
@@ -0,0 +1,47 @@
+import pytest
+import crud
+import models
+import schemas
+from conftest import run
+
+
+def width(model) -> int:
+    return len(model.__table__.columns)
+
+
+# crud call of an endpoint, serialized the way the endpoint does it, and the row width of every
+# statement it may emit: a fixed number of them however big the hierarchy is
+CASES = {
+    "get_user_by_username": (
+        lambda db: crud.get_user_by_username(db, "admin"),
+        lambda res: res.username,
+        [width(models.User)],
+    ),
+    "get_operation_by_id": (
+        lambda db: crud.get_operation_by_id(db, 1),
+        schemas.Operation.from_orm,
+        [width(models.Operation)],
+    ),
+    "get_event_by_id": (
+        lambda db: crud.get_event_by_id(db, 1),
+        schemas.Event.from_orm,
+        [width(models.Event), width(models.Operation)],
+    ),
+    "get_fields": (
+        crud.get_fields,
+        lambda res: [schemas.Field.from_orm(field) for field in res],
+        [width(models.Field), width(models.Bush), width(models.Well), width(models.Event), width(models.Operation)],
+    ),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_statements_per_endpoint(seeded, statements, name):
+    call, serialize, widths = CASES[name]
+
+    async def read():
+        async with models.read_session() as db:
+            serialize(await call(db))
+
+    run(read)
+    assert [row_width for *_, row_width in statements] == widths
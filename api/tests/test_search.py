@@ -0,0 +1,54 @@
+def search_all(client, filters: list[dict], limit: int) -> list[int]:
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit} if cursor is None else {"limit": limit, "cursor": cursor}
+        res = client.post("/operations/search", params=params, json={"filters": filters}).json()
+        ids += [operation["id"] for operation in res["items"]]
+        cursor = res["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_range_search_pages_by_parameter(client):
+    filters = [{"key": "plannedDepth", "op": "ge", "value": 20}, {"key": "actualTime", "op": "exists"}]
+    everything = client.post("/operations/search", params={"limit": 500}, json={"filters": filters}).json()
+    expected = sorted(everything["items"], key=lambda operation: (operation["parameters"]["plannedDepth"], operation["id"]))
+    assert expected
+    assert search_all(client, filters, 7) == [operation["id"] for operation in expected]
+
+
+def test_malformed_cursor(client):
+    res = client.post("/operations/search", params={"cursor": "x:y"}, json={"filters": []})
+    assert res.status_code == 400
+
+
+def test_shortest_names_come_first(seeded):
+    import crud
+    import models
+    import schemas
+    from conftest import run
+
+    async def search():
+        async with models.async_session() as db:
+            for name in ("Бурка на буровой площадке номер один", "Бурка на буровой площадке номер два", "Бурка"):
+                await crud.create_example_operation(db, schemas.ExampleOperationCreate(name=name, parameters={}))
+        async with models.read_session() as db:
+            return await crud.search_names(db, "бурка", 2)
+
+    [(name, example), (longer, _)] = run(search)
+    assert name == example.name == "Бурка"
+    assert longer == "Бурка на буровой площадке номер два"
+
+
+def test_repeated_names_are_returned_once(seeded):
+    import crud
+    import models
+    from conftest import run
+
+    async def search():
+        async with models.read_session() as db:
+            return await crud.search_names(db, "бурение", 10)
+
+    found = run(search)
+    assert [name for name, _ in found] == ["Бурение"] + [f"Бурение %x% {o}" for o in range(5)]
+    assert found[0][1] is not None and all(example is None for _, example in found[1:])
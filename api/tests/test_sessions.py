@@ -0,0 +1,20 @@
+import crud
+import models
+import schemas
+from conftest import run
+
+
+def test_read_session_keeps_its_snapshot(seeded):
+    async def read_around_a_write():
+        async with models.read_session() as reader:
+            before = [field.name for field in await crud.get_fields(reader)]
+            async with models.async_session() as writer:
+                await crud.create_field(writer, schemas.FieldBase(name="Snapshot"))
+            during = [field.name for field in await crud.get_fields(reader)]
+        async with models.read_session() as reader:
+            after = [field.name for field in await crud.get_fields(reader)]
+        return before, during, after
+
+    before, during, after = run(read_around_a_write)
+    assert during == before
+    assert "Snapshot" in after and "Snapshot" not in before
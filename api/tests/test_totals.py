@@ -0,0 +1,62 @@
+import pytest
+import crud
+import models
+
+
+def stored(client, event_id: int) -> list[tuple]:
+    """(id, parameters, planned_days, actual_days) of the operations of the event in order"""
+    async def read():
+        async with models.read_session() as session:
+            event = await crud.get_event_by_id(session, event_id)
+            return [(op.id, op.parameters, op.planned_days, op.actual_days) for op in event.operations]
+
+    return client.portal.call(read)
+
+
+def assert_recomputed(rows: list[tuple]):
+    """the stored running totals are what summing the times from the first operation gives"""
+    planned = actual = 0.0
+    for _, parameters, planned_days, actual_days in rows:
+        planned += crud._days(parameters, "plannedTime")
+        actual += crud._days(parameters, "actualTime")
+        assert (planned_days, actual_days) == (pytest.approx(planned), pytest.approx(actual))
+
+
+def test_running_totals_follow_every_write(client):
+    event_id = client.post("/create_event", json={"name": "Totals", "description": "", "well_id": 1}).json()["obj"]
+
+    def create(planned, actual) -> int:
+        return client.post("/create_operation", json={
+            "name": "op", "parameters": {"plannedTime": planned, "actualTime": actual},
+            "is_complete": False, "event_id": event_id,
+        }).json()["obj"]
+
+    ids = [create(planned, actual) for planned, actual in ((2, 3), (5, 1), (1, 8))]
+    ids += client.post("/bulk/create_operations", json=[
+        {"name": "op", "parameters": {"plannedTime": 4, "actualTime": "x"}, "is_complete": False, "event_id": event_id},
+        {"name": "op", "parameters": {"plannedTime": 6}, "is_complete": False, "event_id": event_id},
+    ]).json()["obj"]
+    rows = stored(client, event_id)
+    assert [row[0] for row in rows] == ids
+    assert rows[-1][2:] == (pytest.approx(18 / 24), pytest.approx(12 / 24))
+    assert_recomputed(rows)
+
+    # an edit in the middle shifts the totals after it
+    assert client.post(f"/update_operation_parameters/{ids[1]}", json={"plannedTime": 10}).json()["ok"]
+    assert_recomputed(stored(client, event_id))
+    assert client.patch(f"/operations/{ids[2]}/parameters", json={"actualTime": None}).status_code == 200
+    assert_recomputed(stored(client, event_id))
+
+    assert client.post(f"/move_operation/{ids[4]}", params={"before_id": ids[0]}).json()["ok"]
+    assert client.post(f"/move_operation/{ids[0]}", params={"after_id": ids[3]}).json()["ok"]
+    rows = stored(client, event_id)
+    assert [row[0] for row in rows] == [ids[4], ids[1], ids[2], ids[3], ids[0]]
+    assert_recomputed(rows)
+
+    assert client.post("/update_operation_order", params={"event_id": event_id}, json=[4, 3, 2, 1, 0]).json()["ok"]
+    assert_recomputed(stored(client, event_id))
+
+    assert client.post(f"/delete_operation/{ids[1]}").json()
+    rows = stored(client, event_id)
+    assert ids[1] not in [row[0] for row in rows]
+    assert_recomputed(rows)